@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+    GCCollector, PlatformCollector, ProcessCollector
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE = 'network_wrangler'
+UNMATCHED_ROUTE = '<unmatched>'
+STATUS_CLASSES = ('1xx', '2xx', '3xx', '4xx', '5xx')
+# The method label comes from the client; anything else is counted as OTHER
+# so arbitrary methods cannot create new label children
+HTTP_METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'))
+OTHER_METHOD = 'OTHER'
+
+# Cached dashboard endpoints answer in well under a millisecond, so the
+# buckets start low; the tail covers slow optimizer-backed requests
+REQUEST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+OPTIMIZER_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+class StatsCollector:
+    '''Exports cache and rate-limiter counters that the components already keep
+
+    The values are read when Prometheus scrapes, so the cached lookups and
+    rate-limit checks themselves carry no instrumentation cost.
+    '''
+
+    def __init__(self):
+        self._caches: Dict[str, Callable[[], Dict]] = {}
+        self._rate_limiters: Dict[str, object] = {}
+
+    def add_cache(self, name: str, stats: Callable[[], Dict]):
+        '''stats() returns a dict with the 'hits' and 'misses' counts of the cache
+
+        An optional 'lookups' count is used for the hit ratio when some lookups
+        were neither, such as callers coalesced onto an in-flight load.
+        '''
+        self._caches[name] = stats
+
+    def add_rate_limiter(self, name: str, limiter):
+        self._rate_limiters[name] = limiter
+
+    def collect(self):
+        hits = CounterMetricFamily(f'{NAMESPACE}_cache_hits', 'Lookups served from the cache', labels=['cache'])
+        misses = CounterMetricFamily(f'{NAMESPACE}_cache_misses', 'Lookups that had to load the value', labels=['cache'])
+        ratio = GaugeMetricFamily(f'{NAMESPACE}_cache_hit_ratio', 'Share of lookups served from the cache', labels=['cache'])
+        for name, stats in self._caches.items():
+            try:
+                values = stats()
+            except Exception as e:
+                logger.warning(f'Reading {name} cache stats failed: {e}')
+                continue
+            lookups = values.get('lookups', values['hits'] + values['misses'])
+            hits.add_metric([name], values['hits'])
+            misses.add_metric([name], values['misses'])
+            ratio.add_metric([name], values['hits'] / lookups if lookups else 0.0)
+
+        rejections = CounterMetricFamily(
+            f'{NAMESPACE}_rate_limit_rejections', 'Requests rejected by the rate limiter', labels=['limiter']
+        )
+        for name, limiter in self._rate_limiters.items():
+            rejections.add_metric([name], limiter.rejections)
+
+        yield from (hits, misses, ratio, rejections)
+
+class APIMetrics:
+    '''Prometheus instrumentation for the API hot paths
+
+    Label children are created up front for every registered route and each
+    status class, so recording a request is a dict lookup plus a histogram
+    observe and a counter increment rather than a labels() call.
+    '''
+
+    def __init__(self, registry: Optional[CollectorRegistry] = None):
+        self.registry = registry or CollectorRegistry()
+        if registry is None:
+            ProcessCollector(registry=self.registry)
+            PlatformCollector(registry=self.registry)
+            GCCollector(registry=self.registry)
+
+        self.request_latency = Histogram(
+            f'{NAMESPACE}_http_request_duration_seconds', 'HTTP request latency by route',
+            ['method', 'route'], buckets=REQUEST_BUCKETS, registry=self.registry
+        )
+        self.requests = Counter(
+            f'{NAMESPACE}_http_requests', 'HTTP responses by route and status class',
+            ['method', 'route', 'status'], registry=self.registry
+        )
+        self.optimizer_duration = Histogram(
+            f'{NAMESPACE}_optimizer_run_duration_seconds', 'Wall time of optimizer runs',
+            ['algorithm'], buckets=OPTIMIZER_BUCKETS, registry=self.registry
+        )
+        self.optimizer_evaluations = Counter(
+            f'{NAMESPACE}_optimizer_evaluations', 'Objective evaluations performed by optimizer runs',
+            ['algorithm'], registry=self.registry
+        )
+        self.loop_lag = Histogram(
+            f'{NAMESPACE}_event_loop_lag_seconds', 'Delay of event loop wake-ups past their deadline',
+            buckets=LOOP_LAG_BUCKETS, registry=self.registry
+        )
+        self.loop_lag_last = Gauge(
+            f'{NAMESPACE}_event_loop_lag_last_seconds', 'Most recent event loop lag sample',
+            registry=self.registry
+        )
+        self.stats = StatsCollector()
+        self.registry.register(self.stats)
+
+        self._routes: Dict[Tuple[str, str], Tuple[Histogram, List[Counter]]] = {}
+        self._optimizers: Dict[str, Tuple[Histogram, Counter]] = {}
+        self._loop_monitor = None
+
+    def preallocate(self, app):
+        '''Create the label children of every HTTP route of app'''
+        for route in app.routes:
+            for method in getattr(route, 'methods', None) or ():
+                self._route_children(method, route.path)
+        for method in ('GET', 'POST', 'PUT', 'PATCH', 'DELETE', OTHER_METHOD):
+            self._route_children(method, UNMATCHED_ROUTE)
+
+    def _route_children(self, method: str, route: str) -> Tuple[Histogram, List[Counter]]:
+        children = self._routes.get((method, route))
+        if children is None:
+            children = (
+                self.request_latency.labels(method, route),
+                [self.requests.labels(method, route, status) for status in STATUS_CLASSES]
+            )
+            self._routes[(method, route)] = children
+        return children
+
+    def observe_request(self, method: str, route: str, status_code: int, seconds: float):
+        children = self._routes.get((method, route))
+        if children is None:
+            if method not in HTTP_METHODS:
+                method = OTHER_METHOD
+            children = self._route_children(method, route)
+        latency, statuses = children
+        latency.observe(seconds)
+        statuses[min(max(status_code // 100, 1), 5) - 1].inc()
+
+    def observe_optimization(self, algorithm: str, seconds: float, evaluations: int):
+        children = self._optimizers.get(algorithm)
+        if children is None:
+            children = (self.optimizer_duration.labels(algorithm), self.optimizer_evaluations.labels(algorithm))
+            self._optimizers[algorithm] = children
+        children[0].observe(seconds)
+        children[1].inc(evaluations)
+
+    def start_loop_monitor(self, interval: float = 0.5):
+        '''Sample event loop lag every interval seconds until stop_loop_monitor'''
+        if self._loop_monitor is None:
+            self._loop_monitor = asyncio.create_task(self._monitor_loop(interval))
+
+    async def stop_loop_monitor(self):
+        if self._loop_monitor is not None:
+            self._loop_monitor.cancel()
+            try:
+                await self._loop_monitor
+            except asyncio.CancelledError:
+                pass
+            self._loop_monitor = None
+
+    async def _monitor_loop(self, interval: float):
+        loop = asyncio.get_running_loop()
+        while True:
+            deadline = loop.time() + interval
+            await asyncio.sleep(interval)
+            lag = max(loop.time() - deadline, 0.0)
+            self.loop_lag.observe(lag)
+            self.loop_lag_last.set(lag)
+
+    def response(self):
+        '''Current metrics in the Prometheus text exposition format'''
+        # Imported here so optimizer services can record runs without loading FastAPI
+        from fastapi import Response
+
+        return Response(content=generate_latest(self.registry), media_type=CONTENT_TYPE_LATEST)
+
+class PrometheusMiddleware:
+    '''ASGI middleware that times every HTTP request against its route template
+
+    Plain ASGI rather than BaseHTTPMiddleware, which would add a task and
+    a memory stream per request.
+    '''
+
+    def __init__(self, app, metrics: APIMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the scope; Starlette routes
+            # such as /docs only record their endpoint and have static paths
+            route = scope.get('route')
+            if route is not None:
+                path = route.path
+            else:
+                path = scope['path'] if 'endpoint' in scope else UNMATCHED_ROUTE
+            self.metrics.observe_request(scope['method'], path, status_code, time.perf_counter() - started)
+
+api_metrics = APIMetrics()
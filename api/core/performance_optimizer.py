@@ -1,54 +1,390 @@
 import asyncio
-import aioredis
-from typing import Dict, Any
 import json
+import logging
+import random
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
+
+import aiohttp
+
+from core.config import settings
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis<4.2 ships the asyncio client as the separate aioredis package
+    try:
+        import aioredis
+    except ImportError:
+        aioredis = None
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class CacheStats:
+    local_hits: int = 0
+    stale_hits: int = 0
+    redis_hits: int = 0
+    misses: int = 0
+    coalesced: int = 0  # Callers that waited on another caller's in-flight query
+    refreshes: int = 0  # Background stale-while-revalidate refreshes
+    redis_errors: int = 0
+    query_seconds: float = 0.0  # Total time spent in query_func
+
+class LocalCache:
+    '''In-process LRU with a fresh TTL and a stale window after it'''
+
+    def __init__(self, max_entries: int, ttl: float, stale_ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries = OrderedDict()
+
+    def get(self, key: str):
+        '''(value, is_fresh), or None when missing or past the stale window'''
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        now = time.monotonic()
+        if now >= expires_at + self.stale_ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value, now < expires_at
+
+    def set(self, key: str, value):
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+class UpdateFailed(Exception):
+    '''A vendor API answered a configuration update with an error status'''
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+class NetworkUpdatePipeline:
+    '''Pushes configuration updates to vendor APIs with bounded concurrency
+
+    Every vendor gets its own queue and max_per_vendor workers, and all
+    workers share a global limit on in-flight requests, so a slow element
+    only holds its own slot instead of stalling a whole batch. Transient
+    failures (connection errors, 429 and 5xx) are retried with full-jitter
+    exponential backoff, without holding a slot while waiting.
+    '''
+
+    RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+    def __init__(self, vendor_endpoints: Optional[Dict[str, str]] = None,
+                 max_concurrent: int = 200, max_per_vendor: int = 50,
+                 vendor_limits: Optional[Dict[str, int]] = None,
+                 max_retries: int = 3, retry_base_delay: float = 0.1, retry_max_delay: float = 5.0,
+                 timeout: float = 10.0):
+        self.vendor_endpoints = dict(vendor_endpoints or settings.VENDOR_API_ENDPOINTS)
+        self.max_concurrent = max_concurrent
+        self.vendor_limits = {
+            vendor: min((vendor_limits or {}).get(vendor, max_per_vendor), max_concurrent)
+            for vendor in self.vendor_endpoints
+        }
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_concurrent),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def process_single_update(self, update: Dict) -> Dict:
+        '''Apply one update: {'vendor', 'element_id', 'parameters'}; a single attempt'''
+        vendor = update['vendor']
+        if vendor not in self.vendor_endpoints:
+            raise ValueError(f"Unknown vendor: {vendor}")
+        
+        url = f"{self.vendor_endpoints[vendor]}/network-elements/{update['element_id']}/configuration"
+        async with self.session.put(url, json=update.get('parameters', {})) as response:
+            await response.read()
+        if response.status >= 400:
+            raise UpdateFailed(f"{vendor} rejected update for {update['element_id']}: HTTP {response.status}",
+                               response.status)
+        
+        return {
+            'element_id': update['element_id'],
+            'vendor': vendor,
+            'status': 'applied',
+            'status_code': response.status
+        }
+
+    async def stream(self, updates: List[Dict]) -> AsyncIterator[Tuple[int, Any]]:
+        '''Yield (index, result) in completion order; result is an exception on failure'''
+        results = asyncio.Queue()
+        queues = {vendor: asyncio.Queue() for vendor in self.vendor_endpoints}
+        for index, update in enumerate(updates):
+            queue = queues.get(update.get('vendor'))
+            if queue is None:
+                results.put_nowait((index, ValueError(f"Unknown vendor: {update.get('vendor')}")))
+            else:
+                queue.put_nowait((index, update))
+        
+        slots = asyncio.Semaphore(self.max_concurrent)
+        workers = [
+            asyncio.create_task(self._vendor_worker(queue, slots, results))
+            for vendor, queue in queues.items()
+            for _ in range(min(self.vendor_limits[vendor], queue.qsize()))
+        ]
+        try:
+            for _ in range(len(updates)):
+                yield await results.get()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _vendor_worker(self, queue: asyncio.Queue, slots: asyncio.Semaphore, results: asyncio.Queue):
+        while not queue.empty():
+            index, update = queue.get_nowait()
+            try:
+                result = await self._process_with_retry(update, slots)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                result = e
+            results.put_nowait((index, result))
+
+    async def _process_with_retry(self, update: Dict, slots: asyncio.Semaphore) -> Dict:
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with slots:
+                    result = await self.process_single_update(update)
+                result['attempts'] = attempt + 1
+                return result
+            except (aiohttp.ClientError, asyncio.TimeoutError, UpdateFailed) as e:
+                retryable = not isinstance(e, UpdateFailed) or e.status_code in self.RETRY_STATUS_CODES
+                if not retryable or attempt == self.max_retries:
+                    raise
+            # Full jitter spreads retries of a struggling vendor over the backoff window
+            delay = min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt)
+            await asyncio.sleep(random.uniform(0, delay))
 
 class PerformanceOptimizer:
-    def __init__(self, redis_url: str):
-        self.redis_client = None
+    '''Two-tier query cache: in-process LRU in front of Redis
+
+    Concurrent misses on one key share a single query_func call, entries past
+    their local TTL are served stale while one background refresh runs, and
+    without Redis (no URL, no client or a failed connection) only the local
+    tier is used. Cached values are shared between callers; treat them as
+    read-only.
+    '''
+
+    def __init__(self, redis_url: Optional[str] = None, redis_client=None,
+                 local_max_entries: int = 1024, local_ttl: float = 30, stale_ttl: float = 60,
+                 update_pipeline: Optional[NetworkUpdatePipeline] = None):
+        self.redis_client = redis_client
         self.redis_url = redis_url
+        # Clients and pipelines passed in are closed by whoever created them
+        self._owns_redis = False
+        self._owns_pipeline = update_pipeline is None
         self.cache_ttl = 300  # 5 minutes
+        self.local_cache = LocalCache(local_max_entries, min(local_ttl, self.cache_ttl), stale_ttl)
+        self.stats = CacheStats()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refresh_tasks: Dict[str, asyncio.Task] = {}
+        self.update_pipeline = update_pipeline or NetworkUpdatePipeline()
     
     async def initialize(self):
         '''Initialize Redis connection for caching'''
-        self.redis_client = await aioredis.from_url(self.redis_url)
+        if self.redis_client is not None or not self.redis_url:
+            return
+        if aioredis is None:
+            logger.warning('No Redis client library installed, using the local cache only')
+            return
+        try:
+            client = aioredis.from_url(self.redis_url)
+            if asyncio.iscoroutine(client):  # aioredis 1.x
+                client = await client
+            await client.ping()
+            self.redis_client = client
+            self._owns_redis = True
+        except Exception as e:
+            logger.warning(f'Redis unavailable ({e}), using the local cache only')
+
+    async def close(self):
+        '''Cancel pending refreshes and close the HTTP session and Redis connection this instance opened'''
+        for task in list(self._refresh_tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._refresh_tasks.values(), return_exceptions=True)
+        if self._owns_pipeline:
+            await self.update_pipeline.close()
+        if self._owns_redis:
+            # redis>=5.0.1 renamed close() to aclose()
+            close = getattr(self.redis_client, 'aclose', None) or self.redis_client.close
+            await close()
+            self.redis_client = None
+            self._owns_redis = False
+
+    @property
+    def local_only(self) -> bool:
+        return self.redis_client is None
     
     async def cached_network_query(self, query_key: str, query_func, *args, **kwargs):
         '''Cache network query results for improved performance'''
         
-        # Check cache first
-        cached_result = await self.redis_client.get(query_key)
-        if cached_result:
-            return json.loads(cached_result)
+        # Check the in-process tier first
+        cached = self.local_cache.get(query_key)
+        if cached is not None:
+            value, is_fresh = cached
+            if is_fresh:
+                self.stats.local_hits += 1
+            else:
+                self.stats.stale_hits += 1
+                self._refresh_in_background(query_key, query_func, args, kwargs)
+            return value
+        
+        return await self._single_flight(query_key, query_func, args, kwargs)
+
+    async def invalidate(self, query_key: str):
+        '''Drop a key from both tiers'''
+        self.local_cache.delete(query_key)
+        if self.redis_client is not None:
+            try:
+                await self.redis_client.delete(query_key)
+            except Exception as e:
+                self._redis_failed(e)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        '''Hit/miss/latency counters
+
+        Callers coalesced onto another caller's query count as lookups that
+        were not hits, so a stampede lowers hit_ratio instead of vanishing
+        from it.
+        '''
+        stats = asdict(self.stats)
+        hits = self.stats.local_hits + self.stats.stale_hits + self.stats.redis_hits
+        lookups = hits + self.stats.misses + self.stats.coalesced
+        stats['hits'] = hits
+        stats['lookups'] = lookups
+        stats['hit_ratio'] = hits / lookups if lookups else 0.0
+        queries = self.stats.misses + self.stats.refreshes
+        stats['avg_query_seconds'] = self.stats.query_seconds / queries if queries else 0.0
+        stats['local_entries'] = len(self.local_cache)
+        stats['local_only'] = self.local_only
+        return stats
+
+    async def _single_flight(self, query_key: str, query_func, args, kwargs, refresh: bool = False):
+        '''Load query_key once however many callers ask for it concurrently'''
+        future = self._inflight.get(query_key)
+        if future is not None:
+            self.stats.coalesced += 1
+            return await asyncio.shield(future)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[query_key] = future
+        try:
+            result = await self._load(query_key, query_func, args, kwargs, skip_redis=refresh)
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception retrieved when nobody else was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[query_key]
+
+    async def _load(self, query_key: str, query_func, args, kwargs, skip_redis: bool):
+        if self.redis_client is not None and not skip_redis:
+            try:
+                cached_result = await self.redis_client.get(query_key)
+            except Exception as e:
+                self._redis_failed(e)
+                cached_result = None
+            if cached_result:
+                self.stats.redis_hits += 1
+                result = json.loads(cached_result)
+                self.local_cache.set(query_key, result)
+                return result
+        
+        # Execute query and cache result in both tiers; a refresh was already
+        # counted as the stale hit that triggered it
+        if not skip_redis:
+            self.stats.misses += 1
+        started = time.perf_counter()
+        try:
+            result = await query_func(*args, **kwargs)
+        finally:
+            self.stats.query_seconds += time.perf_counter() - started
         
-        # Execute query and cache result
-        result = await query_func(*args, **kwargs)
-        await self.redis_client.setex(
-            query_key,
-            self.cache_ttl,
-            json.dumps(result, default=str)
-        )
+        self.local_cache.set(query_key, result)
+        if self.redis_client is not None:
+            try:
+                await self.redis_client.setex(
+                    query_key,
+                    self.cache_ttl,
+                    json.dumps(result, default=str)
+                )
+            except Exception as e:
+                self._redis_failed(e)
         
         return result
+
+    def _refresh_in_background(self, query_key: str, query_func, args, kwargs):
+        '''Stale-while-revalidate: at most one refresh per key, errors keep the stale value'''
+        # A scheduled refresh only enters _inflight once it starts running
+        if query_key in self._inflight or query_key in self._refresh_tasks:
+            return
+        self.stats.refreshes += 1
+        task = asyncio.create_task(self._single_flight(query_key, query_func, args, kwargs, refresh=True))
+        self._refresh_tasks[query_key] = task
+        task.add_done_callback(lambda task: self._refresh_done(query_key, task))
+
+    def _refresh_done(self, query_key: str, task: asyncio.Task):
+        self._refresh_tasks.pop(query_key, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f'Background cache refresh failed: {task.exception()}')
+
+    def _redis_failed(self, error: Exception):
+        self.stats.redis_errors += 1
+        logger.warning(f'Redis cache operation failed: {error}')
+    
+    async def process_single_update(self, update: Dict) -> Dict:
+        '''Apply one network configuration update through its vendor API'''
+        return await self.update_pipeline.process_single_update(update)
+    
+    async def stream_network_updates(self, updates: list) -> AsyncIterator[Tuple[int, Any]]:
+        '''Process updates concurrently, yielding (index, result or exception) as each completes'''
+        async for index, result in self.update_pipeline.stream(updates):
+            yield index, result
     
     async def batch_process_network_updates(self, updates: list):
         '''Batch process network configuration updates for efficiency'''
         
-        batch_size = 50
-        batches = [updates[i:i + batch_size] for i in range(0, len(updates), batch_size)]
-        
-        results = []
-        for batch in batches:
-            batch_tasks = [
-                self.process_single_update(update) 
-                for update in batch
-            ]
-            batch_results = await asyncio.gather(*batch_tasks, return_exceptions=True)
-            results.extend(batch_results)
+        results = [None] * len(updates)
+        async for index, result in self.update_pipeline.stream(updates):
+            results[index] = result
         
         return results
-from sqlalchemy import Index, text
-from sqlalchemy.orm import sessionmaker
 
 class DatabaseOptimizer:
     def __init__(self, database_url: str):
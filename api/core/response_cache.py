@@ -0,0 +1,58 @@
+from dataclasses import dataclass
+from hashlib import blake2b
+from typing import Dict
+
+import orjson
+from fastapi import Request, Response
+
+@dataclass
+class CachedResponse:
+    version: int
+    body: bytes
+    etag: str
+
+class ResponseCache:
+    '''Pre-encoded JSON bodies per endpoint, re-encoded only when the snapshot changes
+
+    The ETag is a hash of the body rather than the snapshot version, so it
+    stays meaningful across workers that each keep their own snapshot.
+    '''
+
+    def __init__(self):
+        self._entries: Dict[str, CachedResponse] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name: str, snapshot) -> CachedResponse:
+        '''Encoded payload name of snapshot, encoding it on first use'''
+        entry = self._entries.get(name)
+        if entry is not None and entry.version == snapshot.version:
+            self.hits += 1
+        else:
+            self.misses += 1
+            body = orjson.dumps(snapshot.payloads[name])
+            entry = CachedResponse(
+                version=snapshot.version,
+                body=body,
+                etag='"' + blake2b(body, digest_size=16).hexdigest() + '"'
+            )
+            self._entries[name] = entry
+        return entry
+
+    def respond(self, request: Request, name: str, snapshot) -> Response:
+        '''200 with the cached body, or 304 when the client already has it'''
+        entry = self.get(name, snapshot)
+        headers = {'ETag': entry.etag, 'Cache-Control': 'no-cache'}
+        if self._matches(request.headers.get('if-none-match'), entry.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type='application/json', headers=headers)
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+    @staticmethod
+    def _matches(if_none_match, etag: str) -> bool:
+        if not if_none_match:
+            return False
+        tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        return '*' in tags or etag in tags
@@ -1,83 +1,261 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+import hashlib
 import jwt
-from typing import Optional
+import logging
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import FrozenSet, Optional, Tuple, Union
+
+from core.config import settings
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+logger = logging.getLogger(__name__)
 
 security = HTTPBearer()
 
+@dataclass(frozen=True)
+class VerifiedToken:
+    '''Claims of a verified JWT with permissions resolved once'''
+    username: str
+    permissions: FrozenSet[str]
+    expires_at: Optional[float]  # exp claim, None when the token does not expire
+
 class SecurityManager:
-    def __init__(self, secret_key: str):
+    def __init__(self, secret_key: str, max_cached_tokens: int = 10_000):
         self.secret_key = secret_key
         self.algorithm = 'HS256'
+        self._algorithms = [self.algorithm]
+        self._key = secret_key.encode()
+        self.max_cached_tokens = max_cached_tokens
+        # sha256(token) -> VerifiedToken, so raw tokens are not kept in memory
+        self._verified_tokens = OrderedDict()
     
     def verify_token(self, credentials: HTTPAuthorizationCredentials = Depends(security)):
         '''Verify JWT token for API authentication'''
+        return self.authenticate(credentials).username
+    
+    def authenticate(self, credentials: HTTPAuthorizationCredentials = Depends(security)) -> VerifiedToken:
+        '''Verified claims of the bearer token, served from the cache until the token expires'''
+        token = credentials.credentials
+        digest = hashlib.sha256(token.encode()).digest()
+        
+        verified = self._verified_tokens.get(digest)
+        if verified is not None:
+            if verified.expires_at is None or verified.expires_at > time.time():
+                self._verified_tokens.move_to_end(digest)
+                return verified
+            del self._verified_tokens[digest]
+        
+        verified = self._decode(token)
+        if self.max_cached_tokens > 0:
+            self._verified_tokens[digest] = verified
+            if len(self._verified_tokens) > self.max_cached_tokens:
+                self._verified_tokens.popitem(last=False)
+        return verified
+    
+    def _decode(self, token: str) -> VerifiedToken:
         try:
-            payload = jwt.decode(
-                credentials.credentials,
-                self.secret_key,
-                algorithms=[self.algorithm]
-            )
-            username = payload.get('sub')
-            if username is None:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail='Invalid authentication token'
-                )
-            return username
+            payload = jwt.decode(token, self._key, algorithms=self._algorithms)
         except jwt.InvalidTokenError:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail='Invalid authentication token'
             )
+        
+        username = payload.get('sub')
+        if username is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='Invalid authentication token'
+            )
+        
+        expires_at = payload.get('exp')
+        return VerifiedToken(
+            username=username,
+            permissions=frozenset(payload.get('permissions', ())),
+            expires_at=float(expires_at) if expires_at is not None else None
+        )
     
-    def check_permissions(self, required_permission: str, user_permissions: list):
+    def check_permissions(self, required_permission: str,
+                          user_permissions: Union[VerifiedToken, FrozenSet[str], list]):
         '''Check if user has required permissions for network operations'''
+        if isinstance(user_permissions, VerifiedToken):
+            user_permissions = user_permissions.permissions
         if required_permission not in user_permissions:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail=f'Insufficient permissions: {required_permission} required'
             )
         return True
-from fastapi import Request, HTTPException
-import time
-from collections import defaultdict
+
+def _sliding_window_retry_after(current: float, previous: float, elapsed: float,
+                                window: float, limit: int) -> float:
+    '''Seconds until the sliding-window estimate drops below limit again'''
+    if current >= limit:
+        # Blocked for the rest of this window, then until this window's weight decays
+        return window - elapsed + max(0.0, 1 - limit / current) * window
+    return max(0.0, (1 - (limit - current) / previous) * window - elapsed)
 
 class RateLimiter:
-    def __init__(self, max_requests: int = 100, window_seconds: int = 60):
+    '''Sliding-window-counter rate limiter with constant memory per client
+
+    Each client keeps the request counts of the current and previous fixed
+    windows; the previous count is weighted by how much of it still overlaps
+    the sliding window. Clients live in an LRU bounded by max_clients, so idle
+    keys are evicted instead of accumulating.
+    '''
+
+    def __init__(self, max_requests: int = 100, window_seconds: int = 60, max_clients: int = 100_000):
         self.max_requests = max_requests
         self.window_seconds = window_seconds
-        self.requests = defaultdict(list)
+        self.max_clients = max_clients
+        self.requests = OrderedDict()  # client -> [window index, current count, previous count]
+        self.rejections = 0
+    
+    def check(self, client_ip: str) -> Tuple[bool, float]:
+        '''Count a request; returns (allowed, seconds to wait before retrying)'''
+        window_index, elapsed = divmod(time.time(), self.window_seconds)
+        
+        counters = self.requests.get(client_ip)
+        if counters is None:
+            counters = [window_index, 0, 0]
+            self.requests[client_ip] = counters
+            if len(self.requests) > self.max_clients:
+                self.requests.popitem(last=False)
+        else:
+            self.requests.move_to_end(client_ip)
+            if counters[0] != window_index:
+                # Roll the windows; a gap of more than one window clears both counts
+                counters[2] = counters[1] if window_index - counters[0] == 1 else 0
+                counters[1] = 0
+                counters[0] = window_index
+        
+        _, current, previous = counters
+        estimate = previous * (1 - elapsed / self.window_seconds) + current
+        if estimate >= self.max_requests:
+            self.rejections += 1
+            return False, _sliding_window_retry_after(
+                current, previous, elapsed, self.window_seconds, self.max_requests
+            )
+        
+        counters[1] += 1
+        return True, 0.0
     
     def is_allowed(self, client_ip: str) -> bool:
         '''Check if request is allowed based on rate limits'''
-        now = time.time()
-        window_start = now - self.window_seconds
+        return self.check(client_ip)[0]
+    
+    async def acquire(self, client_ip: str) -> Tuple[bool, float]:
+        return self.check(client_ip)
+
+class RedisRateLimiter:
+    '''The same sliding-window counter kept in Redis, so the limit holds across workers
+
+    The check-and-increment runs as one Lua script. If Redis fails the
+    request is counted by a local fallback limiter instead of being rejected,
+    and Redis is retried after retry_interval seconds.
+    '''
+
+    SCRIPT = '''
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local limit = tonumber(ARGV[1])
+local window_ms = tonumber(ARGV[2])
+local elapsed_ms = tonumber(ARGV[3])
+if previous * (window_ms - elapsed_ms) / window_ms + current >= limit then
+    return {0, current, previous}
+end
+redis.call('INCR', KEYS[1])
+redis.call('PEXPIRE', KEYS[1], window_ms * 2)
+return {1, current + 1, previous}
+'''
+
+    def __init__(self, redis_client, max_requests: int = 100, window_seconds: int = 60,
+                 key_prefix: str = 'ratelimit', retry_interval: float = 5.0):
+        self.redis_client = redis_client
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.key_prefix = key_prefix
+        self.retry_interval = retry_interval
+        self.fallback = RateLimiter(max_requests, window_seconds)
+        self.redis_rejections = 0
+        self._redis_failing = False
+        self._retry_at = 0.0
+        self._script = redis_client.register_script(self.SCRIPT)
+    
+    @property
+    def rejections(self) -> int:
+        '''Requests rejected through Redis or, while it was unavailable, by the fallback'''
+        return self.redis_rejections + self.fallback.rejections
+    
+    async def acquire(self, client_ip: str) -> Tuple[bool, float]:
+        '''Count a request; returns (allowed, seconds to wait before retrying)'''
+        if self._redis_failing and time.monotonic() < self._retry_at:
+            return self.fallback.check(client_ip)
         
-        # Clean old requests
-        self.requests[client_ip] = [
-            req_time for req_time in self.requests[client_ip] 
-            if req_time > window_start
+        window_index, elapsed = divmod(time.time(), self.window_seconds)
+        window_index = int(window_index)
+        keys = [
+            f'{self.key_prefix}:{client_ip}:{window_index}',
+            f'{self.key_prefix}:{client_ip}:{window_index - 1}'
         ]
+        try:
+            allowed, current, previous = await self._script(
+                keys=keys,
+                args=[self.max_requests, int(self.window_seconds * 1000), int(elapsed * 1000)]
+            )
+        except Exception as e:
+            if not self._redis_failing:
+                logger.warning(f'Redis rate limiter unavailable ({e}), limiting locally')
+                self._redis_failing = True
+            self._retry_at = time.monotonic() + self.retry_interval
+            return self.fallback.check(client_ip)
         
-        # Check if within limits
-        if len(self.requests[client_ip]) >= self.max_requests:
-            return False
-        
-        # Add current request
-        self.requests[client_ip].append(now)
-        return True
+        self._redis_failing = False
+        if allowed:
+            return True, 0.0
+        self.redis_rejections += 1
+        return False, _sliding_window_retry_after(
+            current, previous, elapsed, self.window_seconds, self.max_requests
+        )
+
+def create_rate_limiter(redis_url: Optional[str] = None) -> Union[RateLimiter, RedisRateLimiter]:
+    '''Redis-backed limiter shared by all workers when redis_url is set, else a per-process one'''
+    if not redis_url:
+        return RateLimiter()
+    if aioredis is None:
+        logger.warning('No Redis client library installed, rate limiting per process')
+        return RateLimiter()
+    # Short timeouts: an unreachable Redis must not stall requests before the fallback kicks in
+    client = aioredis.from_url(redis_url, socket_connect_timeout=0.5, socket_timeout=0.5)
+    return RedisRateLimiter(client)
 
-rate_limiter = RateLimiter()
+rate_limiter = create_rate_limiter(settings.REDIS_URL)
+
+# Liveness probes and Prometheus scrapes are never limited
+RATE_LIMIT_EXEMPT_PATHS = frozenset({'/health', '/metrics'})
 
 async def rate_limit_middleware(request: Request, call_next):
     '''Rate limiting middleware for API protection'''
-    client_ip = request.client.host
+    if request.url.path in RATE_LIMIT_EXEMPT_PATHS:
+        return await call_next(request)
+    
+    client_ip = request.client.host if request.client else 'unknown'
     
-    if not rate_limiter.is_allowed(client_ip):
-        raise HTTPException(
+    allowed, retry_after = await rate_limiter.acquire(client_ip)
+    if not allowed:
+        return JSONResponse(
             status_code=429,
-            detail='Rate limit exceeded. Please try again later.'
+            content={'detail': 'Rate limit exceeded. Please try again later.'},
+            headers={'Retry-After': str(max(1, math.ceil(retry_after)))}
         )
     
     response = await call_next(request)
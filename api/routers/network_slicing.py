@@ -1,19 +1,101 @@
-from fastapi import APIRouter
-from typing import Dict, List
+import logging
+
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel, Field
+from typing import Dict, Optional
+
+from core.config import settings
+from services.slice_registry import SliceQuotaExceeded, SlicePersistence, SliceRegistry
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+slice_registry = SliceRegistry(
+    settings.MAX_SLICES_PER_TENANT,
+    persistence=SlicePersistence(settings.DATABASE_URL)
+)
+
+class SliceCreateRequest(BaseModel):
+    tenant_id: str
+    type: str
+    config: Dict = Field(default_factory=dict)
+    id: Optional[str] = None
+
+class SliceUpdateRequest(BaseModel):
+    status: Optional[str] = None
+    config: Optional[Dict] = None
+
+async def start_slice_registry():
+    '''Load persisted slices and start the write-behind persistence'''
+    persistence = slice_registry.persistence
+    if not await persistence.start():
+        return
+    try:
+        slices = await persistence.load_slices()
+    except Exception as e:
+        # e.g. the network_slices table is missing: same fallback as an unreachable database
+        logger.warning(f'Loading persisted slices failed ({e}), keeping slices in memory only')
+        await persistence.stop()
+        return
+    slice_registry.load(slices)
+
+async def stop_slice_registry():
+    await slice_registry.persistence.stop()
+
+def _get_slice_or_404(slice_id: str):
+    network_slice = slice_registry.get(slice_id)
+    if network_slice is None:
+        raise HTTPException(status_code=404, detail=f'Slice {slice_id} not found')
+    return network_slice
+
 @router.get('/slices')
-async def get_network_slices():
+async def get_network_slices(tenant_id: Optional[str] = None,
+                             type: Optional[str] = None,
+                             status: Optional[str] = None,
+                             cursor: Optional[int] = None,
+                             limit: int = Query(50, ge=1, le=1000)):
     '''Get current network slice status'''
+    try:
+        slices, next_cursor = slice_registry.list(tenant_id, type, status, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return {
-        'slices': [
-            {'id': 'embb-1', 'type': 'eMBB', 'status': 'active'},
-            {'id': 'urllc-1', 'type': 'URLLC', 'status': 'active'}
-        ]
+        'slices': [network_slice.to_dict() for network_slice in slices],
+        'next_cursor': next_cursor
     }
 
-@router.post('/slices')
-async def create_network_slice(slice_config: Dict):
+@router.post('/slices', status_code=201)
+async def create_network_slice(slice_config: SliceCreateRequest):
     '''Create new network slice'''
-    return {'message': 'Slice created successfully'}
+    try:
+        network_slice = slice_registry.create(
+            slice_config.tenant_id, slice_config.type, slice_config.config, slice_id=slice_config.id
+        )
+    except SliceQuotaExceeded as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {'message': 'Slice created successfully', 'slice': network_slice.to_dict()}
+
+@router.get('/slices/{slice_id}')
+async def get_network_slice(slice_id: str):
+    '''Get one network slice'''
+    return _get_slice_or_404(slice_id).to_dict()
+
+@router.patch('/slices/{slice_id}')
+async def update_network_slice(slice_id: str, changes: SliceUpdateRequest):
+    '''Change the status or configuration of a network slice'''
+    _get_slice_or_404(slice_id)
+    try:
+        network_slice = slice_registry.update(slice_id, status=changes.status, config=changes.config)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return network_slice.to_dict()
+
+@router.delete('/slices/{slice_id}')
+async def delete_network_slice(slice_id: str):
+    '''Delete a network slice'''
+    _get_slice_or_404(slice_id)
+    slice_registry.delete(slice_id)
+    return {'message': 'Slice deleted successfully'}
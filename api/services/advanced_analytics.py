@@ -1,35 +1,490 @@
-import pandas as pd
+import os
 import numpy as np
-from sklearn.cluster import DBSCAN
-from typing import Dict, List
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import TYPE_CHECKING, Dict, Hashable, List, Optional, Sequence, Tuple
 
-class AdvancedNetworkAnalytics:
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Columns that identify a sample rather than measure the network
+NON_METRIC_COLUMNS = ('timestamp', 'cell_id', 'element_id')
+# Statistics are kept per network element, taken from the first of these columns present
+ELEMENT_COLUMNS = ('cell_id', 'element_id')
+
+# Probable cause per metric family, matched against the metric name
+ROOT_CAUSE_HINTS = [
+    (('prb', 'utilization', 'load', 'users', 'traffic'), 'congestion'),
+    (('sinr', 'interference', 'rssi', 'cqi'), 'radio_interference'),
+    (('rsrp', 'rsrq', 'coverage'), 'coverage_degradation'),
+    (('latency', 'jitter', 'delay'), 'transport_delay'),
+    (('packet_loss', 'drop', 'error', 'retransmission'), 'link_errors'),
+    (('throughput', 'bitrate'), 'throughput_degradation'),
+    (('availability', 'uptime'), 'element_outage'),
+    (('cpu', 'memory', 'temperature'), 'hardware_resources'),
+]
+
+class StreamingAnomalyDetector:
+    '''Online anomaly scoring with per-element EWMA mean and variance
+    
+    Each sample is scored against the exponentially weighted mean and
+    variance of the earlier samples of its element, then folded into them,
+    so scoring is O(1) per sample and history is never revisited. A sample
+    is anomalous when any metric lies more than threshold standard
+    deviations from its running mean, once that metric of the element has
+    seen warmup values. Non-finite values are missing: they get a z-score of
+    0 and leave the statistics untouched.
+    '''
+    
+    def __init__(self, n_features: int, alpha: float = 0.05, threshold: float = 4.0,
+                 warmup: int = 30, min_std: float = 1e-6):
+        self.n_features = n_features
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self.min_std = min_std
+        self._slots: Dict[Hashable, int] = {}
+        self._mean = np.zeros((0, n_features))
+        self._var = np.zeros((0, n_features))
+        self._count = np.zeros((0, n_features), dtype=np.int64)  # Values seen per metric
+    
+    def __len__(self):
+        return len(self._slots)
+    
+    def update(self, element: Hashable, sample: Sequence[float]) -> Tuple[np.ndarray, bool]:
+        '''Score one sample of element and fold it into the element's statistics
+        
+        Returns the per-metric z-scores and whether the sample is anomalous.
+        '''
+        slot = self._slot(element)
+        x = np.asarray(sample, dtype=float)
+        # Views of the element's rows, updated in place
+        mean, var, count = self._mean[slot], self._var[slot], self._count[slot]
+        valid = np.isfinite(x)
+        np.copyto(mean, x, where=valid & (count == 0))
+        
+        diff = x - mean
+        diff[~valid] = 0.0
+        z_scores = diff / np.sqrt(var + self.min_std ** 2)
+        anomalous = (valid & (count >= self.warmup) & (np.abs(z_scores) > self.threshold)).any()
+        
+        mean += self.alpha * diff
+        np.copyto(var, (1 - self.alpha) * (var + self.alpha * diff * diff), where=valid)
+        count += valid
+        return z_scores, bool(anomalous)
+    
+    def score_batch(self, values: np.ndarray, elements: Optional[Sequence] = None) -> Tuple[np.ndarray, np.ndarray]:
+        '''Score a block of samples in arrival order, as if update were called per row
+        
+        Args:
+            values: (n_samples, n_features) metric values
+            elements: Element of each sample; None treats all samples as one stream
+        
+        Returns:
+            (n_samples, n_features) z-scores and a boolean anomaly mask
+        '''
+        values = np.asarray(values, dtype=float)
+        z_scores = np.zeros_like(values)
+        anomalous = np.zeros(len(values), dtype=bool)
+        if not len(values):
+            return z_scores, anomalous
+        
+        if elements is None:
+            z_scores[:], anomalous[:] = self._filter(self._slot(None), values)
+            return z_scores, anomalous
+        
+        import pandas as pd
+        
+        codes, keys = pd.factorize(np.asarray(elements), sort=False)
+        slots = np.array([self._slot(key) for key in keys], dtype=np.intp)
+        # Group the rows of each element together, keeping their arrival order
+        order = np.argsort(codes, kind='stable')
+        bounds = np.flatnonzero(np.diff(codes[order])) + 1
+        
+        lengths = np.diff(np.concatenate([[0], bounds, [len(order)]]))
+        if lengths.max() < len(keys):
+            # Many short series: advance all elements one sample per round instead
+            rank = np.arange(len(order)) - np.repeat(np.concatenate([[0], bounds]), lengths)
+            by_round = order[np.argsort(rank, kind='stable')]
+            for rows in np.split(by_round, np.cumsum(np.bincount(rank))[:-1]):
+                z_scores[rows], anomalous[rows] = self._step(slots[codes[rows]], values[rows])
+            return z_scores, anomalous
+        
+        for rows in np.split(order, bounds):
+            z_scores[rows], anomalous[rows] = self._filter(slots[codes[rows[0]]], values[rows])
+        return z_scores, anomalous
+    
+    def _step(self, slots: np.ndarray, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        '''Apply update to one sample of each of several distinct elements at once'''
+        valid = np.isfinite(x)
+        count = self._count[slots]
+        mean = self._mean[slots]
+        var = self._var[slots]
+        first = valid & (count == 0)
+        mean[first] = x[first]
+        
+        diff = np.where(valid, x - mean, 0.0)
+        z_scores = diff / np.sqrt(var + self.min_std ** 2)
+        self._mean[slots] = mean + self.alpha * diff
+        self._var[slots] = np.where(valid, (1 - self.alpha) * (var + self.alpha * diff * diff), var)
+        self._count[slots] = count + valid
+        
+        anomalous = (valid & (count >= self.warmup) & (np.abs(z_scores) > self.threshold)).any(axis=1)
+        return z_scores, anomalous
+    
+    def element_slots(self, elements: Sequence[Hashable]) -> np.ndarray:
+        '''State slots of elements, registering unseen ones'''
+        return np.array([self._slot(element) for element in elements], dtype=np.intp)
+    
+    def get_state(self, slots: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        '''Copies of the EWMA mean, variance and sample count of slots'''
+        return self._mean[slots], self._var[slots], self._count[slots]
+    
+    def set_state(self, slots: np.ndarray, mean: np.ndarray, var: np.ndarray, count: np.ndarray):
+        self._mean[slots] = mean
+        self._var[slots] = var
+        self._count[slots] = count
+    
+    def _filter(self, slot: int, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        '''Run the EWMA recurrences of one element over x as linear IIR filters'''
+        count = self._count[slot]
+        valid = np.isfinite(x)
+        if valid.all():
+            mean0 = np.where(count == 0, x[0], self._mean[slot])
+            z_scores, self._mean[slot], self._var[slot] = self._ewma(x, mean0, self._var[slot])
+            seen = count + np.arange(len(x))[:, np.newaxis]
+        else:
+            # A missing value holds its metric's state, so each metric runs over its own values
+            z_scores = np.zeros_like(x)
+            for metric in np.flatnonzero(valid.any(axis=0)):
+                rows, column = valid[:, metric], slice(metric, metric + 1)
+                values = x[rows, column]
+                mean0 = values[0] if count[metric] == 0 else self._mean[slot, column]
+                z_scores[rows, column], self._mean[slot, column], self._var[slot, column] = self._ewma(
+                    values, mean0, self._var[slot, column]
+                )
+            seen = count + np.cumsum(valid, axis=0) - valid
+        
+        anomalous = (valid & (seen >= self.warmup) & (np.abs(z_scores) > self.threshold)).any(axis=1)
+        self._count[slot] = count + valid.sum(axis=0)
+        return z_scores, anomalous
+    
+    def _ewma(self, x: np.ndarray, mean0: np.ndarray, var0: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        '''z-scores of the rows of a complete x, and the final mean and variance'''
+        from scipy.signal import lfilter
+        
+        decay = 1 - self.alpha
+        # mean_t = decay * mean_{t-1} + alpha * x_t
+        mean = lfilter([self.alpha], [1, -decay], x, axis=0, zi=(decay * mean0)[np.newaxis])[0]
+        prev_mean = np.vstack([mean0[np.newaxis], mean[:-1]])
+        diff = x - prev_mean
+        # var_t = decay * var_{t-1} + decay * alpha * (x_t - mean_{t-1})^2
+        var = lfilter([decay * self.alpha], [1, -decay], diff * diff, axis=0, zi=(decay * var0)[np.newaxis])[0]
+        prev_var = np.vstack([var0[np.newaxis], var[:-1]])
+        return diff / np.sqrt(prev_var + self.min_std ** 2), mean[-1], var[-1]
+    
+    def _slot(self, element: Hashable) -> int:
+        slot = self._slots.get(element)
+        if slot is None:
+            slot = len(self._slots)
+            self._slots[element] = slot
+            if slot == len(self._count):
+                # Grow geometrically so new elements cost amortized O(1)
+                capacity = max(16, 2 * len(self._count))
+                self._mean = np.resize(self._mean, (capacity, self.n_features))
+                self._var = np.resize(self._var, (capacity, self.n_features))
+                self._count = np.resize(self._count, (capacity, self.n_features))
+            self._mean[slot] = 0.0
+            self._var[slot] = 0.0
+            self._count[slot] = 0
+        return slot
+
+class SharedArrays:
+    '''NumPy arrays in multiprocessing.shared_memory blocks, reopened by name in worker processes'''
+    
     def __init__(self):
-        self.anomaly_detector = DBSCAN(eps=0.5, min_samples=5)
+        self.layout: Dict[str, Tuple[str, Tuple[int, ...], str]] = {}
+        self.arrays: Dict[str, np.ndarray] = {}
+        self._blocks: List[shared_memory.SharedMemory] = []
+    
+    def create(self, name: str, data: np.ndarray) -> np.ndarray:
+        '''Copy data into a new shared block'''
+        block = shared_memory.SharedMemory(create=True, size=max(data.nbytes, 1))
+        self._blocks.append(block)
+        array = np.ndarray(data.shape, dtype=data.dtype, buffer=block.buf)
+        array[...] = data
+        self.layout[name] = (block.name, data.shape, data.dtype.str)
+        self.arrays[name] = array
+        return array
+    
+    @classmethod
+    def attach(cls, layout: Dict[str, Tuple[str, Tuple[int, ...], str]]) -> 'SharedArrays':
+        shared = cls()
+        for name, (block_name, shape, dtype) in layout.items():
+            block = shared_memory.SharedMemory(name=block_name)
+            shared._blocks.append(block)
+            shared.arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        shared.layout = dict(layout)
+        return shared
+    
+    def close(self, unlink: bool = False):
+        self.arrays = {}
+        for block in self._blocks:
+            block.close()
+            if unlink:
+                block.unlink()
+        self._blocks = []
+
+def _score_partition_chunk(layout: Dict, detector_options: Dict, first_group: int, offsets: np.ndarray):
+    '''Worker: score consecutive element partitions in place in the shared arrays
+    
+    offsets are the row offsets of the chunk's partitions (one more than the
+    number of partitions); state rows start at first_group.
+    '''
+    shared = SharedArrays.attach(layout)
+    try:
+        arrays = shared.arrays
+        rows = slice(offsets[0], offsets[-1])
+        groups = slice(first_group, first_group + len(offsets) - 1)
+        
+        detector = StreamingAnomalyDetector(arrays['values'].shape[1], **detector_options)
+        slots = detector.element_slots(range(len(offsets) - 1))
+        detector.set_state(slots, arrays['mean'][groups], arrays['var'][groups], arrays['count'][groups])
+        
+        local_elements = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        arrays['z_scores'][rows], arrays['anomalous'][rows] = detector.score_batch(arrays['values'][rows], local_elements)
+        arrays['mean'][groups], arrays['var'][groups], arrays['count'][groups] = detector.get_state(slots)
+    finally:
+        shared.close()
+
+class AdvancedNetworkAnalytics:
+    def __init__(self, alpha: float = 0.05, threshold: float = 4.0, warmup: int = 30):
+        self.detector_options = {'alpha': alpha, 'threshold': threshold, 'warmup': warmup}
+        self.metric_columns: List[str] = []
+        self._anomaly_detector = None
+        self._detector_columns: List[str] = []
+        self._executor = None
+        self._executor_workers = 0
         self.pattern_analyzer = None
     
-    def detect_network_anomalies(self, metrics_data: pd.DataFrame) -> Dict:
-        '''Advanced anomaly detection for network performance'''
+    @property
+    def anomaly_detector(self) -> Optional[StreamingAnomalyDetector]:
+        '''Streaming detector over metric_columns; None until the first metrics arrive'''
+        return self._anomaly_detector
+    
+    def reset(self):
+        '''Forget the learned per-element statistics'''
+        self._anomaly_detector = None
+    
+    def close(self):
+        '''Shut down the worker processes of the partitioned mode'''
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+            self._executor_workers = 0
+    
+    def detect_network_anomalies(self, metrics_data: 'pd.DataFrame', n_jobs: int = 1) -> Dict:
+        '''Advanced anomaly detection for network performance
+        
+        Samples are scored in timestamp order against the running statistics
+        of their cell (or element), which carry over between calls, so each
+        call only processes the new samples. With n_jobs other than 1 the
+        frame is partitioned by cell and the partitions are scored in a
+        process pool (-1 uses every CPU).
+        '''
         
         # Feature engineering for anomaly detection
         features = self.extract_anomaly_features(metrics_data)
+        detector = self._detector_for(self.metric_columns)
         
-        # Detect anomalies using DBSCAN clustering
-        anomaly_labels = self.anomaly_detector.fit_predict(features)
+        timestamps = metrics_data['timestamp'].to_numpy() if 'timestamp' in metrics_data else None
+        elements = self._element_ids(metrics_data)
+        n_jobs = (os.cpu_count() or 1) if n_jobs == -1 else n_jobs
         
-        # Identify anomalous time periods
-        anomalies = []
-        for i, label in enumerate(anomaly_labels):
-            if label == -1:  # Outlier
-                anomalies.append({
-                    'timestamp': metrics_data.iloc[i]['timestamp'],
-                    'severity': self.calculate_anomaly_severity(features[i]),
-                    'affected_metrics': self.identify_affected_metrics(features[i]),
-                    'root_cause_analysis': self.analyze_root_cause(metrics_data.iloc[i])
-                })
+        # Score every sample against the streaming EWMA statistics
+        if n_jobs > 1 and elements is not None:
+            z_scores, outliers = self._score_partitioned(detector, features, elements, timestamps, n_jobs)
+        elif timestamps is None or metrics_data['timestamp'].is_monotonic_increasing:
+            z_scores, outliers = detector.score_batch(features, elements)
+        else:
+            order = np.argsort(timestamps, kind='stable')
+            z_scores, outliers = np.empty_like(features), np.empty(len(features), dtype=bool)
+            z_scores[order], outliers[order] = detector.score_batch(
+                features[order], None if elements is None else elements[order]
+            )
+        anomaly_labels = np.where(outliers, -1, 0)
+        
+        # Describe all anomalous samples at once from their z-score rows
+        rows = np.flatnonzero(outliers)
+        timestamps = metrics_data['timestamp'].iloc[rows].tolist() if 'timestamp' in metrics_data else [None] * len(rows)
+        anomalies = self._anomaly_records(
+            timestamps, z_scores[rows], None if elements is None else elements[rows].tolist()
+        )
         
         return {
             'anomalies_detected': len(anomalies),
             'anomaly_details': anomalies,
             'network_health_score': self.calculate_health_score(anomaly_labels)
         }
+    
+    def process_sample(self, sample: Dict) -> Optional[Dict]:
+        '''Score one collector sample as it arrives; returns the anomaly record or None'''
+        if not self.metric_columns:
+            self.metric_columns = [
+                key for key, value in sample.items()
+                if key not in NON_METRIC_COLUMNS and isinstance(value, (int, float)) and not isinstance(value, bool)
+            ]
+        detector = self._detector_for(self.metric_columns)
+        element = next((sample[column] for column in ELEMENT_COLUMNS if column in sample), None)
+        
+        # Absent metrics are scored as missing values
+        z_scores, anomalous = detector.update(element, [sample.get(column, np.nan) for column in self.metric_columns])
+        if not anomalous:
+            return None
+        return self._anomaly_records(
+            [sample.get('timestamp')], z_scores[np.newaxis], None if element is None else [element]
+        )[0]
+    
+    def extract_anomaly_features(self, metrics_data: 'pd.DataFrame') -> np.ndarray:
+        '''Numeric KPI columns as a float matrix; missing values stay NaN
+        
+        The detector standardizes the matrix itself, per element, into z-scores,
+        and skips missing values.
+        '''
+        metrics = metrics_data.drop(columns=[c for c in NON_METRIC_COLUMNS if c in metrics_data])
+        metrics = metrics.select_dtypes(include='number')
+        if metrics.shape[1] == 0:
+            raise ValueError('metrics_data has no numeric metric columns')
+        self.metric_columns = list(metrics.columns)
+        return metrics.to_numpy(dtype=float, na_value=np.nan)
+    
+    def calculate_anomaly_severity(self, z_scores: np.ndarray) -> np.ndarray:
+        '''Severity per row from its largest deviation, in multiples of the detection threshold'''
+        peak = np.abs(z_scores).max(axis=1) / self.detector_options['threshold']
+        return np.select([peak >= 2, peak >= 1.5], ['critical', 'high'], default='medium')
+    
+    def identify_affected_metrics(self, z_scores: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        '''Metric order by deviation per row (largest first) and the mask of those beyond the threshold'''
+        deviation = np.abs(z_scores)
+        ranking = np.argsort(-deviation, axis=1, kind='stable')
+        affected = np.take_along_axis(deviation, ranking, axis=1) > self.detector_options['threshold']
+        return ranking, affected
+    
+    def analyze_root_cause(self, z_scores: np.ndarray, ranking: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        '''Primary metric, probable cause and direction per row from its most deviating metric'''
+        primary = ranking[:, 0]
+        causes = np.array([self._metric_cause(metric) for metric in self.metric_columns])[primary]
+        increase = z_scores[np.arange(len(z_scores)), primary] > 0
+        return primary, causes, np.where(increase, 'increase', 'decrease')
+    
+    def calculate_health_score(self, anomaly_labels: np.ndarray) -> float:
+        '''Share of samples without anomalies, on a 0-100 scale'''
+        anomaly_labels = np.asarray(anomaly_labels)
+        if not len(anomaly_labels):
+            return 100.0
+        return round(100.0 * float(np.mean(anomaly_labels != -1)), 1)
+    
+    def _score_partitioned(self, detector: StreamingAnomalyDetector, features: np.ndarray,
+                           elements: np.ndarray, timestamps: Optional[np.ndarray],
+                           n_jobs: int) -> Tuple[np.ndarray, np.ndarray]:
+        '''Score per-element partitions in worker processes through shared memory
+        
+        Rows are laid out partition by partition in time order, and chunks of
+        whole partitions are handed to the workers as row ranges. Only the
+        shared block names and partition offsets are pickled; the workers
+        read the samples and learned statistics and write back z-scores and
+        updated statistics in place.
+        '''
+        import pandas as pd
+        
+        codes, keys = pd.factorize(elements, sort=False)
+        order = np.lexsort((timestamps, codes)) if timestamps is not None else np.argsort(codes, kind='stable')
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(keys)))])
+        slots = detector.element_slots(keys)
+        mean, var, count = detector.get_state(slots)
+        
+        # Several chunks per worker of roughly equal row counts, cut at partition boundaries
+        n_chunks = min(len(keys), 4 * n_jobs)
+        cuts = np.searchsorted(offsets, np.linspace(0, len(codes), n_chunks + 1)[1:-1])
+        bounds = np.unique(np.concatenate([[0], cuts, [len(keys)]]))
+        
+        shared = SharedArrays()
+        try:
+            shared.create('values', features[order])
+            shared.create('z_scores', np.zeros_like(features))
+            shared.create('anomalous', np.zeros(len(features), dtype=bool))
+            shared.create('mean', mean)
+            shared.create('var', var)
+            shared.create('count', count)
+            
+            executor = self._pool(n_jobs)
+            futures = [
+                executor.submit(_score_partition_chunk, shared.layout, self.detector_options,
+                                int(first), offsets[first:last + 1])
+                for first, last in zip(bounds[:-1], bounds[1:])
+            ]
+            for future in futures:
+                future.result()
+            
+            arrays = shared.arrays
+            detector.set_state(slots, arrays['mean'], arrays['var'], arrays['count'])
+            z_scores, outliers = np.empty_like(features), np.empty(len(features), dtype=bool)
+            z_scores[order], outliers[order] = arrays['z_scores'], arrays['anomalous']
+        finally:
+            shared.close(unlink=True)
+        return z_scores, outliers
+    
+    def _pool(self, n_jobs: int) -> ProcessPoolExecutor:
+        if self._executor is None or self._executor_workers != n_jobs:
+            self.close()
+            self._executor = ProcessPoolExecutor(max_workers=n_jobs)
+            self._executor_workers = n_jobs
+        return self._executor
+    
+    def _detector_for(self, metric_columns: List[str]) -> StreamingAnomalyDetector:
+        if self._anomaly_detector is None or self._detector_columns != metric_columns:
+            # A different metric set cannot reuse the learned statistics
+            self._anomaly_detector = StreamingAnomalyDetector(len(metric_columns), **self.detector_options)
+            self._detector_columns = list(metric_columns)
+        return self._anomaly_detector
+    
+    def _anomaly_records(self, timestamps: List, z_scores: np.ndarray,
+                         elements: Optional[Sequence] = None) -> List[Dict]:
+        '''Anomaly detail dicts for rows of z-scores, with every score computed column-wise'''
+        if not len(z_scores):
+            return []
+        severity = self.calculate_anomaly_severity(z_scores)
+        ranking, affected = self.identify_affected_metrics(z_scores)
+        primary, causes, direction = self.analyze_root_cause(z_scores, ranking)
+        
+        names = np.array(self.metric_columns, dtype=object)[ranking]
+        anomalies = []
+        for i, timestamp in enumerate(timestamps):
+            affected_metrics = names[i][affected[i]].tolist()
+            anomalies.append({
+                'timestamp': timestamp,
+                'element_id': None if elements is None else elements[i],
+                'severity': str(severity[i]),
+                'affected_metrics': affected_metrics,
+                'root_cause_analysis': {
+                    'probable_cause': str(causes[i]),
+                    'primary_metric': self.metric_columns[primary[i]],
+                    'direction': str(direction[i]),
+                    'correlated_metrics': affected_metrics[1:]
+                }
+            })
+        return anomalies
+    
+    @staticmethod
+    def _metric_cause(metric: str) -> str:
+        for keywords, cause in ROOT_CAUSE_HINTS:
+            if any(keyword in metric.lower() for keyword in keywords):
+                return cause
+        return 'unknown'
+    
+    @staticmethod
+    def _element_ids(metrics_data: 'pd.DataFrame') -> Optional[np.ndarray]:
+        for column in ELEMENT_COLUMNS:
+            if column in metrics_data:
+                return metrics_data[column].to_numpy()
+        return None
@@ -1,32 +1,422 @@
-import pandas as pd
-from sklearn.ensemble import RandomForestRegressor
-from typing import Dict, List
+import numpy as np
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, Hashable, List, Optional, Union
+
+from core.config import settings
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+TEMPORAL_FEATURES = ['hour', 'day_of_week', 'month', 'holiday', 'weather']
+
+# Two-sided normal quantiles for the supported confidence levels
+Z_SCORES = {0.8: 1.2816, 0.9: 1.6449, 0.95: 1.96, 0.99: 2.5758}
+
+@dataclass
+class DemandModel:
+    '''Fitted forecaster of one region and the history it has seen'''
+    model: Any
+    n_rows: int
+    last_timestamp: Any
+    residual_var: float
+    weather: float  # Recent mean weather, assumed for future hours
+    version: Hashable
+    updates: int = 0  # Warm-start updates since the last fit on the full history
+
+def _fit_cell_forecast(X: np.ndarray, y: np.ndarray, future_calendar: np.ndarray, weather: float,
+                       n_estimators: int):
+    '''Worker: fit one cell's forest and forecast it; returns the forecast and out-of-bag residual variance'''
+    from sklearn.ensemble import RandomForestRegressor
+    
+    model = RandomForestRegressor(n_estimators=n_estimators, oob_score=True, random_state=42)
+    model.fit(X, y)
+    future = np.column_stack([future_calendar, np.full(len(future_calendar), weather)])
+    return model.predict(future), float(np.mean((model.oob_prediction_ - y) ** 2))
 
 class CapacityPlanner:
-    def __init__(self):
-        self.demand_model = RandomForestRegressor(n_estimators=100)
+    '''Traffic demand forecasting with per-region model and forecast caches
+    
+    The first forecast of a region fits a random forest on its full history.
+    Later calls with the same history append-only extended only fit new
+    trees on a recent window (warm start) and retire the oldest trees, so
+    an update costs O(new data) instead of O(all history). Window trees
+    only see the last update_window hours, so month and holiday effects
+    come from the full-history trees; the model is refitted on the full
+    history every refit_interval updates, by default before any of those
+    trees would be retired. A forecast is cached per region until the data
+    version changes.
+    '''
+    
+    def __init__(self, n_estimators: int = 100, trees_per_update: int = 10, max_estimators: int = 200,
+                 update_window: int = 168, max_regions: int = 20_000, refit_interval: Optional[int] = None):
+        self.n_estimators = n_estimators
+        self.trees_per_update = trees_per_update
+        self.max_estimators = max_estimators
+        self.update_window = update_window
+        self.max_regions = max_regions
+        if refit_interval is None:
+            refit_interval = max(1, (max_estimators - n_estimators) // trees_per_update)
+        self.refit_interval = refit_interval
         self.capacity_thresholds = {
-            'warning': 0.8,
-            'critical': 0.95
+            'warning': settings.CAPACITY_THRESHOLD_WARNING,
+            'critical': settings.CAPACITY_THRESHOLD_CRITICAL
         }
+        self.models: 'OrderedDict[Hashable, DemandModel]' = OrderedDict()
+        self._forecasts: Dict[Hashable, tuple] = {}
+        self._batch_forecast = None
+        self._holidays = None
+    
+    @property
+    def demand_model(self):
+        '''Model of the default region, or None before its first forecast'''
+        entry = self.models.get('default')
+        return entry.model if entry is not None else None
     
-    def predict_capacity_demand(self, historical_data: pd.DataFrame, forecast_horizon: int = 168):
-        '''Predict network capacity demand for next 7 days'''
+    def predict_capacity_demand(self, historical_data: 'pd.DataFrame', forecast_horizon: Optional[int] = None,
+                                region: Hashable = 'default', capacity: Optional[float] = None,
+                                data_version: Optional[Hashable] = None) -> Dict:
+        '''Predict network capacity demand for the next forecast_horizon hours (default one week)
         
-        # Feature engineering
-        features = self.extract_temporal_features(historical_data)
-        X = features[['hour', 'day_of_week', 'month', 'holiday', 'weather']].values
-        y = historical_data['traffic_volume'].values
+        historical_data holds hourly 'timestamp' and 'traffic_volume' columns in
+        time order, optionally 'weather', 'holiday' and 'capacity'. Without an
+        explicit data_version, the row count and last timestamp identify it.
+        Capacity alerts need a capacity, passed or as the latest 'capacity'
+        value; without one there are none.
+        '''
+        forecast_horizon = forecast_horizon or settings.CAPACITY_PREDICTION_HORIZON
+        if data_version is None:
+            data_version = (len(historical_data), historical_data['timestamp'].iloc[-1])
         
-        # Train model
-        self.demand_model.fit(X, y)
+        key = (data_version, forecast_horizon, capacity)
+        cached = self._forecasts.get(region)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        
+        entry = self._update_model(region, historical_data, data_version)
         
         # Generate forecasts
-        future_features = self.generate_future_features(forecast_horizon)
-        predictions = self.demand_model.predict(future_features)
+        future_features = self.generate_future_features(forecast_horizon, entry.last_timestamp, entry.weather)
+        predictions = entry.model.predict(future_features)
         
-        return {
+        result = {
             'predictions': predictions.tolist(),
-            'confidence_intervals': self.calculate_confidence_intervals(predictions),
-            'capacity_alerts': self.identify_capacity_alerts(predictions)
+            'confidence_intervals': self.calculate_confidence_intervals(predictions, np.sqrt(entry.residual_var)),
+            'capacity_alerts': self.identify_capacity_alerts(
+                predictions, capacity if capacity is not None else self._capacity(historical_data), entry.last_timestamp
+            )
+        }
+        self._forecasts[region] = (key, result)
+        return result
+    
+    def invalidate(self, region: Optional[Hashable] = None):
+        '''Drop the cached model and forecast of region, or of every region'''
+        if region is None:
+            self.models.clear()
+            self._forecasts.clear()
+        else:
+            self.models.pop(region, None)
+            self._forecasts.pop(region, None)
+    
+    def predict_capacity_demand_batch(self, historical_data: 'pd.DataFrame', forecast_horizon: Optional[int] = None,
+                                      capacity: Union[None, float, Dict[Hashable, float]] = None,
+                                      n_jobs: int = -1, confidence: float = 0.95, min_history: int = 48,
+                                      data_version: Optional[Hashable] = None) -> Dict:
+        '''Forecast every cell of a long-format frame in one call
+        
+        historical_data holds hourly 'cell_id', 'timestamp' and 'traffic_volume'
+        columns, optionally 'weather', 'holiday' and 'capacity'. The calendar
+        features are computed once per distinct timestamp and once for the
+        forecast hours, which follow the latest timestamp of the frame, and are
+        shared by all cells. Cells are fitted in parallel with joblib (n_jobs=-1
+        uses every CPU); cells with fewer than min_history hours are skipped.
+        Cells without a passed or recorded capacity get no capacity alerts.
+        Without an explicit data_version, a hash of the frame's contents
+        identifies it for the result cache.
+        
+        Returns:
+            Dict with the cell_ids and forecast timestamps, (n_cells, horizon)
+            arrays of predictions and interval bounds (NaN rows for skipped
+            cells), and the capacity alerts of all cells
+        '''
+        import pandas as pd
+        from joblib import Parallel, delayed
+        
+        forecast_horizon = forecast_horizon or settings.CAPACITY_PREDICTION_HORIZON
+        if data_version is None:
+            # Row count and last timestamp are not enough: other cells can share both
+            row_hashes = pd.util.hash_pandas_object(historical_data, index=False).to_numpy()
+            data_version = (len(historical_data), int(row_hashes.sum()))
+        key = (data_version, forecast_horizon, confidence, min_history)
+        if capacity is None and self._batch_forecast is not None and self._batch_forecast[0] == key:
+            return self._copy_batch_forecast(self._batch_forecast[1])
+        
+        cell_codes, cell_ids = pd.factorize(historical_data['cell_id'], sort=True)
+        timestamps = pd.to_datetime(historical_data['timestamp']).to_numpy()
+        order = np.lexsort((timestamps, cell_codes))
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(cell_codes, minlength=len(cell_ids)))])
+        
+        # Calendar block: once per distinct timestamp, then gathered per row
+        timestamp_codes, unique_timestamps = pd.factorize(timestamps)
+        X = np.empty((len(historical_data), len(TEMPORAL_FEATURES)))
+        X[:, :4] = self._calendar_features(pd.DatetimeIndex(unique_timestamps))[timestamp_codes]
+        if 'holiday' in historical_data:
+            X[:, 3] = historical_data['holiday'].to_numpy(dtype=float)
+        X[:, 4] = historical_data['weather'].to_numpy(dtype=float) if 'weather' in historical_data else 0.0
+        X, y = X[order], historical_data['traffic_volume'].to_numpy(dtype=float)[order]
+        
+        last_timestamp = pd.Timestamp(unique_timestamps.max())
+        forecast_times = pd.date_range(last_timestamp + pd.Timedelta(hours=1), periods=forecast_horizon, freq='h')
+        future_calendar = self._calendar_features(forecast_times)
+        
+        # Mean weather of each cell's last day, assumed for its forecast hours
+        weather_sums = np.concatenate([[0.0], np.cumsum(X[:, 4])])
+        recent = np.maximum(offsets[1:] - 24, offsets[:-1])
+        weather = (weather_sums[offsets[1:]] - weather_sums[recent]) / np.maximum(offsets[1:] - recent, 1)
+        
+        eligible = np.flatnonzero(np.diff(offsets) >= min_history)
+        fits = Parallel(n_jobs=n_jobs)(
+            delayed(_fit_cell_forecast)(
+                X[offsets[i]:offsets[i + 1]], y[offsets[i]:offsets[i + 1]],
+                future_calendar, weather[i], self.n_estimators
+            )
+            for i in eligible
+        )
+        
+        predictions = np.full((len(cell_ids), forecast_horizon), np.nan)
+        residual_std = np.full(len(cell_ids), np.nan)
+        if fits:
+            predictions[eligible] = np.vstack([forecast for forecast, _ in fits])
+            residual_std[eligible] = np.sqrt([residual_var for _, residual_var in fits])
+        lower, upper = self._interval_bounds(predictions, residual_std[:, np.newaxis], confidence)
+        
+        capacities = self._cell_capacities(historical_data, capacity, cell_ids, order, offsets)
+        utilization = predictions / np.where(capacities > 0, capacities, np.nan)[:, np.newaxis]
+        
+        skipped = np.ones(len(cell_ids), dtype=bool)
+        skipped[eligible] = False
+        result = {
+            'cell_ids': cell_ids.tolist(),
+            'timestamps': forecast_times,
+            'predictions': predictions,
+            'confidence_intervals': {'confidence': confidence, 'lower': lower, 'upper': upper},
+            'capacity_alerts': self._alert_records(utilization, last_timestamp, cell_ids.tolist()),
+            'skipped_cells': cell_ids[skipped].tolist()
+        }
+        if capacity is None:
+            # Callers get copies so changing a result cannot alter the cached one
+            self._batch_forecast = (key, result)
+            return self._copy_batch_forecast(result)
+        return result
+    
+    @staticmethod
+    def _copy_batch_forecast(result: Dict) -> Dict:
+        '''Copy of a batch forecast whose arrays, lists and alert records are not shared'''
+        intervals = result['confidence_intervals']
+        return {
+            'cell_ids': list(result['cell_ids']),
+            'timestamps': result['timestamps'],  # DatetimeIndex is immutable
+            'predictions': result['predictions'].copy(),
+            'confidence_intervals': {
+                'confidence': intervals['confidence'],
+                'lower': intervals['lower'].copy(),
+                'upper': intervals['upper'].copy()
+            },
+            'capacity_alerts': [dict(alert) for alert in result['capacity_alerts']],
+            'skipped_cells': list(result['skipped_cells'])
         }
+    
+    def extract_temporal_features(self, historical_data: 'pd.DataFrame') -> 'pd.DataFrame':
+        '''Calendar and weather features of each hourly sample'''
+        import pandas as pd
+        
+        calendar = self._calendar_features(pd.DatetimeIndex(pd.to_datetime(historical_data['timestamp'])))
+        features = pd.DataFrame(calendar, columns=TEMPORAL_FEATURES[:4], index=historical_data.index)
+        if 'holiday' in historical_data:
+            features['holiday'] = historical_data['holiday'].to_numpy(dtype=float)
+        features['weather'] = historical_data['weather'].to_numpy(dtype=float) if 'weather' in historical_data else 0.0
+        return features
+    
+    def generate_future_features(self, forecast_horizon: int, last_timestamp=None, weather: float = 0.0) -> np.ndarray:
+        '''Feature matrix (columns as TEMPORAL_FEATURES) of the forecast_horizon hours after last_timestamp'''
+        import pandas as pd
+        
+        start = pd.Timestamp(last_timestamp) if last_timestamp is not None else pd.Timestamp.now().floor('h')
+        timestamps = pd.date_range(start + pd.Timedelta(hours=1), periods=forecast_horizon, freq='h')
+        return np.column_stack([self._calendar_features(timestamps), np.full(forecast_horizon, weather)])
+    
+    def calculate_confidence_intervals(self, predictions: np.ndarray, residual_std: float,
+                                       confidence: float = 0.95) -> Dict:
+        '''Normal prediction intervals from the model's out-of-sample residual spread'''
+        lower, upper = self._interval_bounds(predictions, residual_std, confidence)
+        return {
+            'confidence': confidence,
+            'lower': lower.tolist(),
+            'upper': upper.tolist()
+        }
+    
+    def identify_capacity_alerts(self, predictions: np.ndarray, capacity: float, last_timestamp=None) -> List[Dict]:
+        '''One alert per contiguous run of forecast hours above the warning threshold'''
+        if not capacity or not len(predictions):
+            return []
+        utilization = np.asarray(predictions, dtype=float)[np.newaxis] / capacity
+        return self._alert_records(utilization, last_timestamp)
+    
+    @staticmethod
+    def _interval_bounds(predictions: np.ndarray, residual_std, confidence: float):
+        margin = Z_SCORES[confidence] * residual_std
+        return np.maximum(predictions - margin, 0.0), predictions + margin
+    
+    def _alert_records(self, utilization: np.ndarray, last_timestamp=None,
+                       cell_ids: Optional[List] = None) -> List[Dict]:
+        '''Alerts for the runs of hours above the warning threshold in each row of utilization'''
+        import pandas as pd
+        
+        rows, starts, ends, peak_hours, peaks = self._alert_runs(utilization)
+        critical = peaks >= self.capacity_thresholds['critical']
+        origin = pd.Timestamp(last_timestamp) if last_timestamp is not None else None
+        peak_times = (origin + pd.to_timedelta(peak_hours + 1, unit='h')) if origin is not None else None
+        
+        alerts = []
+        for i in range(len(rows)):
+            alert = {
+                'severity': 'critical' if critical[i] else 'warning',
+                'start_hour': int(starts[i]) + 1,
+                'end_hour': int(ends[i]),
+                'peak_utilization': round(float(peaks[i]), 3),
+                'peak_time': peak_times[i].isoformat() if peak_times is not None else None
+            }
+            if cell_ids is not None:
+                alert = {'cell_id': cell_ids[rows[i]], **alert}
+            alerts.append(alert)
+        return alerts
+    
+    def _alert_runs(self, utilization: np.ndarray):
+        '''Row, start, end (exclusive), peak hour and peak of every run above the warning threshold'''
+        above = utilization >= self.capacity_thresholds['warning']  # NaN rows never alert
+        padded = np.zeros((len(above), above.shape[1] + 2), dtype=np.int8)
+        padded[:, 1:-1] = above
+        edges = np.diff(padded, axis=1)
+        # Row-major order pairs every start with the end of the same run
+        rows, starts = np.nonzero(edges == 1)
+        _, ends = np.nonzero(edges == -1)
+        if not len(rows):
+            empty = np.zeros(0, dtype=np.intp)
+            return empty, empty, empty, empty, np.zeros(0)
+        
+        lengths = ends - starts
+        first = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        run_ids = np.repeat(np.arange(len(rows)), lengths)
+        hours = np.repeat(starts, lengths) + np.arange(lengths.sum()) - np.repeat(first, lengths)
+        values = utilization[np.repeat(rows, lengths), hours]
+        # Highest value first within each run
+        peak_index = np.lexsort((-values, run_ids))[first]
+        return rows, starts, ends, hours[peak_index], values[peak_index]
+    
+    def _cell_capacities(self, historical_data: 'pd.DataFrame', capacity, cell_ids, order: np.ndarray,
+                         offsets: np.ndarray) -> np.ndarray:
+        '''Capacity per cell, given or latest recorded; NaN (no alerts) when unknown'''
+        if isinstance(capacity, dict):
+            return np.array([capacity.get(cell_id, np.nan) for cell_id in cell_ids], dtype=float)
+        if capacity is not None:
+            return np.full(len(cell_ids), float(capacity))
+        if 'capacity' in historical_data:
+            return historical_data['capacity'].to_numpy(dtype=float)[order][offsets[1:] - 1]
+        return np.full(len(cell_ids), np.nan)
+    
+    def _update_model(self, region: Hashable, historical_data: 'pd.DataFrame', data_version: Hashable) -> DemandModel:
+        '''Cached model of region, extended with the rows added since it was fitted'''
+        entry = self.models.get(region)
+        if entry is not None:
+            self.models.move_to_end(region)
+            if entry.version == data_version:
+                return entry
+            if entry.updates < self.refit_interval and self._extends(entry, historical_data):
+                return self._warm_start(entry, historical_data, data_version)
+        
+        entry = self._fit(historical_data, data_version)
+        self.models[region] = entry
+        while len(self.models) > self.max_regions:
+            evicted, _ = self.models.popitem(last=False)
+            self._forecasts.pop(evicted, None)
+        return entry
+    
+    def _fit(self, historical_data: 'pd.DataFrame', data_version: Hashable) -> DemandModel:
+        from sklearn.ensemble import RandomForestRegressor
+        
+        X = self.extract_temporal_features(historical_data)[TEMPORAL_FEATURES].to_numpy(dtype=float)
+        y = historical_data['traffic_volume'].to_numpy(dtype=float)
+        model = RandomForestRegressor(n_estimators=self.n_estimators, warm_start=True, oob_score=True,
+                                      random_state=42)
+        model.fit(X, y)
+        # Out-of-bag errors, as in-sample residuals of a forest are close to zero
+        residual_var = float(np.mean((model.oob_prediction_ - y) ** 2))
+        # Window updates would recompute it for every tree against the window rows
+        model.oob_score = False
+        return DemandModel(
+            model=model,
+            n_rows=len(historical_data),
+            last_timestamp=historical_data['timestamp'].iloc[-1],
+            residual_var=residual_var,
+            weather=self._recent_weather(X),
+            version=data_version
+        )
+    
+    def _warm_start(self, entry: DemandModel, historical_data: 'pd.DataFrame', data_version: Hashable) -> DemandModel:
+        '''Grow trees on the recent window and retire the oldest ones'''
+        new_rows = len(historical_data) - entry.n_rows
+        window = historical_data.iloc[-max(self.update_window, new_rows):]
+        X = self.extract_temporal_features(window)[TEMPORAL_FEATURES].to_numpy(dtype=float)
+        y = window['traffic_volume'].to_numpy(dtype=float)
+        
+        # Errors on rows the model has not seen yet are the honest residuals
+        errors = entry.model.predict(X[-new_rows:]) - y[-new_rows:]
+        weight = min(1.0, new_rows / self.update_window)
+        entry.residual_var = (1 - weight) * entry.residual_var + weight * float(np.mean(errors ** 2))
+        
+        model = entry.model
+        model.n_estimators = len(model.estimators_) + self.trees_per_update
+        model.fit(X, y)
+        if len(model.estimators_) > self.max_estimators:
+            model.estimators_ = model.estimators_[-self.max_estimators:]
+            model.n_estimators = self.max_estimators
+        
+        entry.n_rows = len(historical_data)
+        entry.last_timestamp = historical_data['timestamp'].iloc[-1]
+        entry.weather = self._recent_weather(X)
+        entry.version = data_version
+        entry.updates += 1
+        return entry
+    
+    @staticmethod
+    def _extends(entry: DemandModel, historical_data: 'pd.DataFrame') -> bool:
+        '''Whether historical_data is the history the model saw plus appended rows'''
+        return (len(historical_data) > entry.n_rows
+                and historical_data['timestamp'].iloc[entry.n_rows - 1] == entry.last_timestamp)
+    
+    @staticmethod
+    def _recent_weather(X: np.ndarray) -> float:
+        return float(X[-24:, TEMPORAL_FEATURES.index('weather')].mean())
+    
+    @staticmethod
+    def _capacity(historical_data: 'pd.DataFrame') -> Optional[float]:
+        '''Latest provisioned capacity, None when it is not recorded'''
+        if 'capacity' in historical_data:
+            return float(historical_data['capacity'].iloc[-1])
+        return None
+    
+    def _calendar_features(self, timestamps: 'pd.DatetimeIndex') -> np.ndarray:
+        '''hour, day_of_week, month and holiday columns of timestamps'''
+        return np.column_stack([
+            timestamps.hour,
+            timestamps.dayofweek,
+            timestamps.month,
+            self._is_holiday(timestamps)
+        ]).astype(float)
+    
+    def _is_holiday(self, timestamps: 'pd.DatetimeIndex') -> np.ndarray:
+        from pandas.tseries.holiday import USFederalHolidayCalendar
+        
+        if self._holidays is None:
+            self._holidays = USFederalHolidayCalendar().holidays('2000-01-01', '2100-12-31')
+        return timestamps.normalize().isin(self._holidays).astype(float)
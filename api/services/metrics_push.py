@@ -0,0 +1,160 @@
+import asyncio
+import logging
+from typing import Dict, Iterable, Optional, Set
+
+import orjson
+from fastapi import WebSocket, WebSocketDisconnect
+
+logger = logging.getLogger(__name__)
+
+_REMOVED = None  # Value sent for keys that disappeared from a payload
+
+def payload_delta(previous: Dict, current: Dict) -> Dict:
+    '''Keys of current that changed since previous; nested dicts are diffed recursively, lists are replaced'''
+    delta = {}
+    for key, value in current.items():
+        old = previous.get(key)
+        if isinstance(value, dict) and isinstance(old, dict):
+            nested = payload_delta(old, value)
+            if nested:
+                delta[key] = nested
+        elif value != old or key not in previous:
+            delta[key] = value
+    for key in previous.keys() - current.keys():
+        delta[key] = _REMOVED
+    return delta
+
+class PushClient:
+    '''One WebSocket subscriber with a bounded outgoing frame queue'''
+
+    def __init__(self, websocket: WebSocket, topics: Set[str], queue_size: int):
+        self.websocket = websocket
+        self.topics = topics
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        # Set when frames were dropped; the next send is a full snapshot instead
+        self.needs_resync = False
+
+    def offer(self, frame: bytes):
+        '''Queue a frame without blocking; a client that falls behind is resynced'''
+        if self.needs_resync:
+            return
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            self.needs_resync = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)  # Wake the sender
+
+class MetricsPushHub:
+    '''Fans out every metrics snapshot to WebSocket subscribers
+
+    Each tick is diffed against the previous snapshot per topic and every
+    frame is encoded once to UTF-8 JSON bytes, then sent as the same binary
+    frame buffer to all subscribers of that topic.
+    Clients get a full snapshot on connect, deltas afterwards, and a full
+    resync when their queue overflows because they read too slowly.
+    '''
+
+    def __init__(self, snapshots, queue_size: int = 32):
+        self.snapshots = snapshots
+        self.queue_size = queue_size
+        self.clients: Set[PushClient] = set()
+        self._snapshot = None
+        self._full_frames: Dict[str, bytes] = {}
+        snapshots.add_listener(self.publish)
+
+    @property
+    def topics(self) -> Set[str]:
+        return set(self.snapshots.current().payloads)
+
+    def publish(self, snapshot):
+        '''Encode the deltas of a new snapshot once and queue them for subscribers'''
+        previous, self._snapshot = self._snapshot, snapshot
+        self._full_frames = {}
+        if previous is None or not self.clients:
+            return
+
+        for topic, payload in snapshot.payloads.items():
+            delta = payload_delta(previous.payloads.get(topic, {}), payload)
+            if not delta:
+                continue
+            frame = self._encode('delta', snapshot.version, topic, delta, base=previous.version)
+            for client in self.clients:
+                if topic in client.topics:
+                    client.offer(frame)
+
+    def full_frame(self, topic: str) -> bytes:
+        '''Complete payload of topic for the current snapshot, encoded once per version'''
+        snapshot = self.snapshots.current()
+        if snapshot is not self._snapshot:
+            self.publish(snapshot)
+        frame = self._full_frames.get(topic)
+        if frame is None:
+            frame = self._encode('snapshot', snapshot.version, topic, snapshot.payloads[topic])
+            self._full_frames[topic] = frame
+        return frame
+
+    def parse_topics(self, topics: Optional[Iterable[str]]) -> Set[str]:
+        available = self.topics
+        if not topics:
+            return available
+        return {topic for topic in topics if topic in available}
+
+    async def serve(self, websocket: WebSocket, topics: Optional[Iterable[str]] = None):
+        '''Run one subscriber connection until it disconnects'''
+        await websocket.accept()
+        client = PushClient(websocket, self.parse_topics(topics), self.queue_size)
+        for topic in sorted(client.topics):
+            client.offer(self.full_frame(topic))
+        self.clients.add(client)
+
+        sender = asyncio.create_task(self._send_loop(client))
+        try:
+            await self._receive_loop(client)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            self.clients.discard(client)
+            sender.cancel()
+
+    async def _send_loop(self, client: PushClient):
+        try:
+            while True:
+                frame = await client.queue.get()
+                if client.needs_resync:
+                    client.needs_resync = False
+                    for topic in sorted(client.topics):
+                        await client.websocket.send_bytes(self.full_frame(topic))
+                    continue
+                if frame is not None:
+                    await client.websocket.send_bytes(frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            # The receive loop notices the closed socket and cleans up
+            logger.debug(f'Push to subscriber failed: {exc}')
+
+    async def _receive_loop(self, client: PushClient):
+        '''Handle {"action": "subscribe" | "unsubscribe", "topics": [...]} messages'''
+        while True:
+            try:
+                message = orjson.loads(await client.websocket.receive_text())
+                action, topics = message['action'], self.parse_topics(message['topics'])
+            except (orjson.JSONDecodeError, KeyError, TypeError):
+                continue
+
+            if action == 'subscribe':
+                for topic in sorted(topics - client.topics):
+                    client.offer(self.full_frame(topic))
+                client.topics |= topics
+            elif action == 'unsubscribe':
+                client.topics -= topics
+
+    @staticmethod
+    def _encode(kind: str, version: int, topic: str, data: Dict, base: Optional[int] = None) -> bytes:
+        message = {'type': kind, 'topic': topic, 'version': version, 'data': data}
+        if base is not None:
+            message['base'] = base
+        # Kept as bytes: a text frame would be re-encoded to UTF-8 for every client
+        return orjson.dumps(message)
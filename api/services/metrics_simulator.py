@@ -0,0 +1,270 @@
+import asyncio
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict
+
+@dataclass
+class MetricsSnapshot:
+    '''One consistent set of network metrics, shared by every read endpoint'''
+    version: int
+    generated_at: float  # time.monotonic() of the tick
+    timestamp: str
+    payloads: Dict[str, Dict] = field(default_factory=dict)
+
+class MetricsSimulator:
+    '''Simulated network state for realistic metric variations'''
+
+    def __init__(self):
+        self.start_time = time.time()
+        self.base_sla = 91.0  # Base SLA compliance
+        self.base_efficiency = 2.9  # Base spectrum efficiency
+
+    def get_time_factor(self) -> float:
+        '''Get time-based variation factor (daily cycle)'''
+        hours = (time.time() - self.start_time) / 3600
+        return 0.95 + 0.1 * math.sin(hours * math.pi / 12)  # Daily cycle
+
+    def get_network_load(self, hour: int) -> float:
+        '''Simulate network load based on time'''
+        if 9 <= hour <= 17:  # Business hours
+            return 0.8 + random.uniform(-0.1, 0.15)
+        elif 19 <= hour <= 22:  # Evening peak
+            return 0.9 + random.uniform(-0.05, 0.1)
+        else:  # Off-peak
+            return 0.4 + random.uniform(-0.1, 0.2)
+
+    def get_sla_compliance(self, time_factor: float, load: float) -> float:
+        '''Calculate realistic SLA compliance with variations'''
+        load_impact = (1 - load) * 5  # Higher load = lower SLA
+        random_variation = random.uniform(-2, 2)
+
+        sla = self.base_sla * time_factor + load_impact + random_variation
+        return max(85.0, min(98.0, round(sla, 1)))  # Realistic bounds
+
+    def get_spectrum_efficiency(self, time_factor: float, load: float) -> float:
+        '''Calculate realistic spectrum efficiency'''
+        # Efficiency decreases with high load due to interference
+        load_penalty = load * 0.3
+        random_variation = random.uniform(-0.2, 0.2)
+
+        efficiency = self.base_efficiency * time_factor - load_penalty + random_variation
+        return max(2.0, min(4.0, round(efficiency, 2)))  # Realistic 5G range
+
+    def take_snapshot(self, version: int) -> MetricsSnapshot:
+        '''Draw load, SLA and efficiency once and derive every endpoint payload from them'''
+        now = datetime.now()
+        timestamp = now.isoformat() + 'Z'
+        time_factor = self.get_time_factor()
+        load = self.get_network_load(now.hour)
+        sla = self.get_sla_compliance(time_factor, load)
+        efficiency = self.get_spectrum_efficiency(time_factor, load)
+
+        return MetricsSnapshot(
+            version=version,
+            generated_at=time.monotonic(),
+            timestamp=timestamp,
+            payloads={
+                'performance': self.build_performance_metrics(sla, efficiency, load, timestamp),
+                'slices': self.build_slice_performance(sla, load, timestamp),
+                'spectrum': self.build_spectrum_analysis(efficiency, timestamp),
+                'capacity': self.build_capacity_metrics(load, timestamp),
+                'alerts': self.build_active_alerts(sla, load, timestamp)
+            }
+        )
+
+    def build_performance_metrics(self, sla: float, efficiency: float, load: float, timestamp: str) -> Dict:
+        '''Network performance metrics'''
+        # Health score derived from SLA and efficiency
+        health_score = (sla * 0.6 + (efficiency / 4.0) * 100 * 0.4)
+
+        return {
+            'health_score': round(health_score, 1),
+            'sla_compliance': sla,
+            'spectrum_efficiency': efficiency,
+            'active_slices': random.randint(38, 47),  # Realistic slice count variation
+            'network_utilization': round(load * 100, 1),
+            'timestamp': timestamp
+        }
+
+    def build_slice_performance(self, overall_sla: float, load: float, timestamp: str) -> Dict:
+        '''Per-slice performance derived from overall conditions'''
+        slice_types = [
+            {
+                'id': 'slice-embb-001',
+                'type': 'eMBB',
+                'base_sla': overall_sla + random.uniform(-2, 3),
+                'base_throughput': 850,
+                'base_latency': 12
+            },
+            {
+                'id': 'slice-urllc-001',
+                'type': 'URLLC',
+                'base_sla': overall_sla + random.uniform(-5, 1),  # Stricter requirements
+                'base_throughput': 100,
+                'base_latency': 0.8
+            },
+            {
+                'id': 'slice-mmtc-001',
+                'type': 'mMTC',
+                'base_sla': overall_sla + random.uniform(-1, 5),  # More lenient
+                'base_throughput': 10,
+                'base_latency': 100
+            }
+        ]
+
+        # Apply load impact to metrics
+        throughput_factor = 1 - (load - 0.5) * 0.3  # High load reduces throughput
+        latency_factor = 1 + (load - 0.5) * 0.4     # High load increases latency
+
+        slices = [
+            {
+                'id': slice_config['id'],
+                'type': slice_config['type'],
+                'sla_compliance': round(max(80, min(98, slice_config['base_sla'])), 1),
+                'throughput': round(slice_config['base_throughput'] * throughput_factor, 1),
+                'latency': round(slice_config['base_latency'] * latency_factor, 2),
+                'availability': round(99.5 + random.uniform(-0.3, 0.5), 2)
+            }
+            for slice_config in slice_types
+        ]
+
+        return {
+            'slices': slices,
+            'overall_compliance': overall_sla,
+            'timestamp': timestamp
+        }
+
+    def build_spectrum_analysis(self, efficiency: float, timestamp: str) -> Dict:
+        '''Spectrum efficiency per frequency band'''
+        frequency_bands = [
+            {'band': '700MHz', 'efficiency': efficiency + random.uniform(-0.3, 0.2)},
+            {'band': '1800MHz', 'efficiency': efficiency + random.uniform(-0.2, 0.3)},
+            {'band': '2100MHz', 'efficiency': efficiency + random.uniform(-0.1, 0.4)},
+            {'band': '2600MHz', 'efficiency': efficiency + random.uniform(0.1, 0.5)},
+            {'band': '3500MHz', 'efficiency': efficiency + random.uniform(0.2, 0.6)},
+            {'band': '28GHz', 'efficiency': efficiency + random.uniform(0.5, 1.0)}
+        ]
+
+        return {
+            'overall_efficiency': efficiency,
+            'frequency_bands': [
+                {**band, 'efficiency': round(max(1.5, min(5.0, band['efficiency'])), 2)}
+                for band in frequency_bands
+            ],
+            'optimization_status': 'active' if random.random() > 0.3 else 'idle',
+            'timestamp': timestamp
+        }
+
+    def build_capacity_metrics(self, load: float, timestamp: str) -> Dict:
+        '''Network capacity and planning metrics'''
+        return {
+            'current_utilization': round(load * 100, 1),
+            'capacity_threshold_warning': 80.0,
+            'capacity_threshold_critical': 95.0,
+            'predicted_peak_hours': [9, 10, 11, 19, 20, 21],
+            'remaining_capacity': round((1 - load) * 100, 1),
+            'capacity_planning': {
+                'next_7_days': round(load * 100 + random.uniform(-5, 10), 1),
+                'next_30_days': round(load * 100 + random.uniform(-10, 15), 1)
+            },
+            'timestamp': timestamp
+        }
+
+    def build_active_alerts(self, sla: float, load: float, timestamp: str) -> Dict:
+        '''Alerts raised by the current conditions'''
+        alerts = []
+
+        if sla < 88:
+            alerts.append({
+                'id': 'sla-001',
+                'severity': 'high',
+                'type': 'SLA_VIOLATION',
+                'message': f'SLA compliance dropped to {sla}%',
+                'timestamp': timestamp
+            })
+
+        if load > 0.9:
+            alerts.append({
+                'id': 'cap-001',
+                'severity': 'warning',
+                'type': 'HIGH_UTILIZATION',
+                'message': f'Network utilization at {round(load*100, 1)}%',
+                'timestamp': timestamp
+            })
+
+        # Random operational alerts
+        if random.random() < 0.3:
+            alerts.append({
+                'id': f'opt-{random.randint(100, 999)}',
+                'severity': 'info',
+                'type': 'OPTIMIZATION_COMPLETE',
+                'message': 'RF optimization cycle completed successfully',
+                'timestamp': timestamp
+            })
+
+        return {
+            'alerts': alerts,
+            'total_active': len(alerts),
+            'timestamp': timestamp
+        }
+
+class MetricsSnapshotService:
+    '''Computes one metrics snapshot per tick and serves every reader from it
+
+    A background task refreshes the snapshot every interval seconds, so a
+    request only reads a dict. If the task is not running (or falls behind),
+    the first reader after the interval refreshes it inline. Listeners are
+    called with every new snapshot.
+    '''
+
+    def __init__(self, simulator: MetricsSimulator, interval: float):
+        self.simulator = simulator
+        self.interval = interval
+        self._snapshot = simulator.take_snapshot(version=1)
+        self._task = None
+        self._listeners = []
+
+    def add_listener(self, callback):
+        '''Call callback(snapshot) after every refresh'''
+        self._listeners.append(callback)
+
+    def refresh(self) -> MetricsSnapshot:
+        '''Compute the next snapshot'''
+        self._snapshot = self.simulator.take_snapshot(version=self._snapshot.version + 1)
+        for callback in self._listeners:
+            callback(self._snapshot)
+        return self._snapshot
+
+    def current(self) -> MetricsSnapshot:
+        '''Latest snapshot, refreshed inline when it is older than the interval'''
+        if time.monotonic() - self._snapshot.generated_at >= self.interval:
+            return self.refresh()
+        return self._snapshot
+
+    def payload(self, name: str) -> Dict:
+        return self.current().payloads[name]
+
+    async def run(self):
+        '''Refresh the snapshot on every tick'''
+        while True:
+            delay = self._snapshot.generated_at + self.interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                self.refresh()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,279 @@
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from core.metrics import api_metrics
+
+@dataclass
+class OptimizationBudget:
+    '''Limits for a single optimizer run; None means unlimited'''
+    max_evaluations: Optional[int] = None
+    time_limit: Optional[float] = None  # seconds of wall-clock time
+
+@dataclass
+class OptimizationResult:
+    '''Outcome of an optimizer run (minimization)'''
+    x: np.ndarray
+    fun: float
+    success: bool
+    algorithm: str
+    evaluations: int
+    iterations: int
+    elapsed: float
+    population: Optional[np.ndarray] = None
+    population_energies: Optional[np.ndarray] = None
+
+class _BudgetedObjective:
+    '''Batch objective wrapper that counts candidate evaluations against a budget'''
+
+    def __init__(self, batch_objective, budget: Optional[OptimizationBudget]):
+        self.batch_objective = batch_objective
+        self.budget = budget or OptimizationBudget()
+        self.started = time.perf_counter()
+        self.evaluations = 0
+
+    def __call__(self, population):
+        self.evaluations += len(population)
+        return self.batch_objective(population)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def exhausted(self, upcoming: int = 0) -> bool:
+        '''True when the budget is spent or the next batch of upcoming candidates would exceed it'''
+        max_evaluations = self.budget.max_evaluations
+        if max_evaluations is not None and self.evaluations + upcoming > max_evaluations:
+            return True
+        time_limit = self.budget.time_limit
+        return time_limit is not None and self.elapsed() >= time_limit
+
+class _PopulationTracker:
+    '''Batch objective wrapper that mirrors the population differential_evolution keeps
+
+    With deferred updating, trial k replaces member k when its energy is lower
+    or equal, and the best member is then swapped into slot 0. Replaying that
+    rule on the evaluated batches recovers the final population for warm starts.
+    '''
+
+    def __init__(self, batch_objective):
+        self.batch_objective = batch_objective
+        self.population = None
+        self.energies = None
+
+    def __call__(self, population):
+        energies = self.batch_objective(population)
+        if self.population is None:
+            self.population, self.energies = population.copy(), energies.copy()
+        elif len(population) == len(self.population):
+            accepted = energies <= self.energies
+            self.population[accepted] = population[accepted]
+            self.energies[accepted] = energies[accepted]
+        else:
+            # Single-candidate calls come from polishing, not from the population
+            return energies
+
+        best = np.argmin(self.energies)
+        self.population[[0, best]] = self.population[[best, 0]]
+        self.energies[[0, best]] = self.energies[[best, 0]]
+        return energies
+
+def _vectorized_scipy_objective(batch_objective):
+    '''Adapt a (pop_size, n_params) batch objective to scipy's vectorized calling convention'''
+    def objective_function(params):
+        # scipy sends the population as columns (n_params, pop_size);
+        # polishing sends a single 1-D candidate
+        scores = batch_objective(np.atleast_2d(params.T))
+        return scores if params.ndim == 2 else scores[0]
+    return objective_function
+
+def _initial_population_size(init, popsize, n_params) -> int:
+    '''Number of members differential_evolution evaluates per generation'''
+    if not isinstance(init, str):
+        return len(init)
+    # scipy's size for a generated population, which needs at least 5 members
+    return max(5, popsize * n_params)
+
+def run_differential_evolution(objective, lower, upper, seed, max_iterations, x0=None,
+                               popsize=15, init='latinhypercube', **_):
+    '''Genetic search: scipy differential_evolution on whole-population batches'''
+    from scipy.optimize import differential_evolution
+
+    tracker = _PopulationTracker(objective)
+    generations = [0]
+
+    budget = objective.budget
+    if budget.max_evaluations is not None:
+        # The initial population is always evaluated and every generation then
+        # costs one more population, so stop after the generations that fit in
+        # the rest of the budget; a budget below one population still gets it
+        population_size = _initial_population_size(init, popsize, len(lower))
+        remaining = budget.max_evaluations - objective.evaluations - population_size
+        max_iterations = min(max_iterations, max(remaining // population_size, 0))
+
+    def callback(*args, **kwargs):
+        # Called once per generation; returning True stops the run before the
+        # next generation would overrun the budget
+        generations[0] += 1
+        return objective.exhausted(len(tracker.population))
+
+    result = differential_evolution(
+        _vectorized_scipy_objective(tracker),
+        list(zip(lower, upper)),
+        maxiter=max_iterations,
+        popsize=popsize,
+        seed=seed,
+        init=init,
+        x0=x0,
+        callback=callback,
+        # Polishing is an unbudgeted gradient search, only run it without limits
+        polish=budget.max_evaluations is None and budget.time_limit is None,
+        vectorized=True,
+        updating='deferred'
+    )
+    return result.x, result.fun, result.success, generations[0], tracker.population, tracker.energies
+
+def run_simulated_annealing(objective, lower, upper, seed, max_iterations, x0=None,
+                            population_size=32, final_temperature_ratio=1e-3, **_):
+    '''Simulated annealing with independent Metropolis chains advanced as one batch'''
+    rng = np.random.default_rng(seed)
+    n_params = len(lower)
+    span = upper - lower
+    chains = rng.uniform(lower, upper, (population_size, n_params))
+    if x0 is not None:
+        chains[0] = x0
+    energies = objective(chains)
+    best = np.argmin(energies)
+    best_x, best_f = chains[best].copy(), energies[best]
+
+    initial_temperature = max(np.std(energies), 1e-12)
+    temperature = initial_temperature
+    cooling = final_temperature_ratio ** (1.0 / max(max_iterations, 1))
+    # Perturb a handful of coordinates per move so high-dimensional moves stay local
+    move_probability = min(1.0, 8.0 / n_params)
+    chain_index = np.arange(population_size)
+
+    iterations = 0
+    while iterations < max_iterations and not objective.exhausted(population_size):
+        step = 0.1 * span * np.sqrt(max(temperature / initial_temperature, 1e-2))
+        moved = rng.random((population_size, n_params)) < move_probability
+        moved[chain_index, rng.integers(n_params, size=population_size)] = True
+        proposals = np.clip(chains + moved * rng.normal(size=moved.shape) * step, lower, upper)
+        proposal_energies = objective(proposals)
+
+        delta = proposal_energies - energies
+        accepted = rng.random(population_size) < np.exp(np.minimum(0.0, -delta / temperature))
+        chains[accepted] = proposals[accepted]
+        energies[accepted] = proposal_energies[accepted]
+
+        best = np.argmin(energies)
+        if energies[best] < best_f:
+            best_x, best_f = chains[best].copy(), energies[best]
+        temperature *= cooling
+        iterations += 1
+
+    return best_x, best_f, iterations == max_iterations, iterations, chains, energies
+
+def run_particle_swarm(objective, lower, upper, seed, max_iterations, x0=None, population_size=32,
+                       inertia=0.72, cognitive=1.49, social=1.49, **_):
+    '''Global-best particle swarm optimization with the whole swarm scored per call'''
+    rng = np.random.default_rng(seed)
+    n_params = len(lower)
+    span = upper - lower
+    max_velocity = 0.2 * span
+    positions = rng.uniform(lower, upper, (population_size, n_params))
+    if x0 is not None:
+        positions[0] = x0
+    velocities = rng.uniform(-max_velocity, max_velocity, positions.shape)
+
+    energies = objective(positions)
+    personal_best, personal_energies = positions.copy(), energies.copy()
+    best = np.argmin(personal_energies)
+
+    iterations = 0
+    while iterations < max_iterations and not objective.exhausted(population_size):
+        r_cognitive = rng.random(positions.shape)
+        r_social = rng.random(positions.shape)
+        velocities = (inertia * velocities
+                      + cognitive * r_cognitive * (personal_best - positions)
+                      + social * r_social * (personal_best[best] - positions))
+        np.clip(velocities, -max_velocity, max_velocity, out=velocities)
+        positions += velocities
+        # Particles stop at the bounds instead of flying past them
+        outside = (positions < lower) | (positions > upper)
+        np.clip(positions, lower, upper, out=positions)
+        velocities[outside] = 0.0
+
+        energies = objective(positions)
+        improved = energies < personal_energies
+        personal_best[improved] = positions[improved]
+        personal_energies[improved] = energies[improved]
+        best = np.argmin(personal_energies)
+        iterations += 1
+
+    return (personal_best[best].copy(), personal_energies[best], iterations == max_iterations,
+            iterations, personal_best, personal_energies)
+
+class OptimizerEngine:
+    '''Runs a named optimization algorithm over a vectorized batch objective
+
+    Every algorithm minimizes a function that takes a (pop_size, n_params)
+    array and returns one score per row, so the RF objective is shared as is.
+    '''
+
+    ALGORITHMS = {
+        'genetic': run_differential_evolution,
+        'simulated_annealing': run_simulated_annealing,
+        'particle_swarm': run_particle_swarm
+    }
+
+    # Differential evolution keeps popsize * n_params members; past this size
+    # the fixed-size swarm is the better use of a budget
+    AUTO_GENETIC_MAX_PARAMS = 300
+
+    def __init__(self, enabled_algorithms=None):
+        self.enabled_algorithms = list(enabled_algorithms or self.ALGORITHMS)
+
+    def select_algorithm(self, algorithm: str, n_params: int) -> str:
+        '''Resolve 'auto' and check that the algorithm is enabled'''
+        if algorithm == 'auto':
+            preferred = ['genetic', 'particle_swarm', 'simulated_annealing']
+            if n_params > self.AUTO_GENETIC_MAX_PARAMS:
+                preferred = ['particle_swarm', 'simulated_annealing', 'genetic']
+            for candidate in preferred:
+                if candidate in self.enabled_algorithms:
+                    return candidate
+        if algorithm not in self.ALGORITHMS or algorithm not in self.enabled_algorithms:
+            raise ValueError(
+                f'Unknown or disabled optimization algorithm: {algorithm} '
+                f'(enabled: {", ".join(self.enabled_algorithms)})'
+            )
+        return algorithm
+
+    def minimize(self, batch_objective, bounds, algorithm: str = 'auto',
+                 budget: Optional[OptimizationBudget] = None, max_iterations: int = 1000,
+                 seed: int = 42, x0=None, **options) -> OptimizationResult:
+        '''Minimize batch_objective within bounds using the selected algorithm'''
+        bounds = np.asarray(bounds, dtype=float)
+        lower, upper = bounds[:, 0], bounds[:, 1]
+        algorithm = self.select_algorithm(algorithm, len(bounds))
+
+        objective = _BudgetedObjective(batch_objective, budget)
+        x, fun, success, iterations, population, energies = self.ALGORITHMS[algorithm](
+            objective, lower, upper, seed, max_iterations, x0=x0, **options
+        )
+
+        result = OptimizationResult(
+            x=x,
+            fun=float(fun),
+            success=bool(success),
+            algorithm=algorithm,
+            evaluations=objective.evaluations,
+            iterations=iterations,
+            elapsed=objective.elapsed(),
+            population=population,
+            population_energies=energies
+        )
+        api_metrics.observe_optimization(result.algorithm, result.elapsed, result.evaluations)
+        return result
@@ -1,37 +1,452 @@
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
-from scipy.optimize import differential_evolution
+
+from core.config import settings
+from services.optimizer_engine import OptimizationBudget, OptimizerEngine
+from services.site_neighbor_index import SiteNeighborIndex
+
+# Parameter bounds per site: [tilt, azimuth, power]
+SITE_BOUNDS = [(0, 15), (0, 360), (20, 43)]
+
+def _optimize_site_cluster(task):
+    '''Process-pool entry point: optimize one cluster of sites in isolation'''
+    optimizer = RFOptimizer()
+    batch_objective = optimizer.build_batch_objective(
+        task['cell_sites'],
+        task['traffic_patterns'],
+        coupling=task['coupling'],
+        normalizer=task['normalizer']
+    )
+    result = optimizer.run_optimizer(
+        batch_objective, len(task['cell_sites']), task['algorithm'], task['budget'],
+        task['maxiter'], task['popsize'], task['seed']
+    )
+    return task['site_indices'], result.x, result.success
 
 class RFOptimizer:
-    def __init__(self):
-        self.optimization_algorithms = ['genetic', 'simulated_annealing', 'particle_swarm']
-    
-    def optimize_antenna_parameters(self, cell_sites, traffic_patterns):
-        '''Optimize antenna tilt, azimuth, and power'''
-        
-        def objective_function(params):
-            # Calculate coverage, capacity, and interference
-            coverage_score = self.calculate_coverage(params, cell_sites)
-            interference_score = self.calculate_interference(params, cell_sites)
-            capacity_score = self.calculate_capacity(params, traffic_patterns)
-            
-            # Multi-objective optimization
-            return -(0.4 * coverage_score + 0.3 * capacity_score - 0.3 * interference_score)
-        
-        # Parameter bounds: [tilt, azimuth, power] for each site
-        bounds = [(0, 15), (0, 360), (20, 43)] * len(cell_sites)
-        
-        result = differential_evolution(
-            objective_function,
-            bounds,
-            maxiter=1000,
-            seed=42
-        )
-        
+    def __init__(self, interference_radius_km: float = 10.0, max_cached_topologies: int = 8):
+        self.optimization_algorithms = list(settings.OPTIMIZATION_ALGORITHMS)
+        self.engine = OptimizerEngine(self.optimization_algorithms)
+        # Upper bound on floats held by one chunk of a population evaluation
+        self.max_batch_elements = 2_000_000
+        # Only sites closer than this interfere with each other
+        self.interference_radius_km = interference_radius_km
+        # Neighbor index and coupling matrix per topology, reused across runs
+        self.max_cached_topologies = max_cached_topologies
+        self._topology_cache = OrderedDict()
+        # Last solution, DE population and traffic demand per topology for warm starts
+        self._warm_starts = OrderedDict()
+
+    def optimize_antenna_parameters(self, cell_sites, traffic_patterns, vectorized=True,
+                                    maxiter=1000, popsize=15, partitioned=False,
+                                    algorithm='genetic', budget: OptimizationBudget = None,
+                                    **partition_options):
+        '''Optimize antenna tilt, azimuth, and power
+
+        algorithm is one of the enabled settings.OPTIMIZATION_ALGORITHMS or 'auto';
+        budget optionally caps evaluations and wall-clock time of the run.
+        '''
+
+        if partitioned:
+            return self.optimize_antenna_parameters_partitioned(
+                cell_sites, traffic_patterns, maxiter=maxiter, popsize=popsize,
+                algorithm=algorithm, budget=budget, **partition_options
+            )
+
+        if vectorized:
+            batch_objective = self.build_batch_objective(cell_sites, traffic_patterns)
+            result = self.run_optimizer(batch_objective, len(cell_sites), algorithm, budget,
+                                        maxiter, popsize)
+            self._remember_solution(cell_sites, traffic_patterns, result.x,
+                                    result.population, result.population_energies)
+        else:
+            from scipy.optimize import differential_evolution
+
+            # Resolved once per run rather than re-fingerprinting the topology per evaluation
+            topology = self._get_topology(cell_sites)
+
+            def objective_function(params):
+                # Calculate coverage, capacity, and interference
+                coverage_score = self.calculate_coverage(params, cell_sites)
+                interference_score = self.calculate_interference(params, cell_sites, topology)
+                capacity_score = self.calculate_capacity(params, traffic_patterns)
+
+                # Multi-objective optimization
+                return -(0.4 * coverage_score + 0.3 * capacity_score - 0.3 * interference_score)
+
+            result = differential_evolution(
+                objective_function,
+                SITE_BOUNDS * len(cell_sites),
+                maxiter=maxiter,
+                popsize=popsize,
+                seed=42
+            )
+
         return {
             'optimized_parameters': result.x,
             'optimization_score': -result.fun,
             'convergence': result.success
         }
+
+    def run_optimizer(self, batch_objective, n_sites, algorithm='genetic', budget=None,
+                      maxiter=1000, popsize=15, seed=42, **options):
+        '''Minimize a batch objective over n_sites with the selected engine algorithm
+
+        The result carries the final population and its energies
+        (population, population_energies) so a later run can be seeded from them.
+        '''
+        if self.engine.select_algorithm(algorithm, 3 * n_sites) == 'genetic':
+            options['popsize'] = popsize
+        return self.engine.minimize(
+            batch_objective,
+            SITE_BOUNDS * n_sites,
+            algorithm=algorithm,
+            budget=budget,
+            max_iterations=maxiter,
+            seed=seed,
+            **options
+        )
+
+    def reoptimize_antenna_parameters(self, cell_sites, traffic_patterns, change_threshold=0.2,
+                                      maxiter=20, popsize=15):
+        '''Incrementally re-optimize after traffic changes, for the periodic optimization loop
+
+        Starts from the previous solution for this topology and re-optimizes only
+        the sites whose demand moved by more than change_threshold (relative)
+        since they were last optimized, seeding differential_evolution with the
+        matching columns of the previous population. Falls back to a full
+        optimize_antenna_parameters run when the topology has no stored solution.
+        '''
+        key = self.topology_key(cell_sites)
+        state = self._warm_starts.get(key)
+        if state is None or state['n_patterns'] != len(traffic_patterns):
+            result = self.optimize_antenna_parameters(cell_sites, traffic_patterns, popsize=popsize)
+            result['reoptimized_sites'] = list(range(len(cell_sites)))
+            return result
+        self._warm_starts.move_to_end(key)
+
+        batch_objective = self.build_batch_objective(cell_sites, traffic_patterns)
+        demand = self._site_demand(traffic_patterns, len(cell_sites))
+        changed = np.abs(demand - state['demand']) > change_threshold * np.abs(state['demand'])
+        sites = np.flatnonzero(changed)
+        base = state['params']
+
+        if len(sites) == 0:
+            return {
+                'optimized_parameters': base.copy(),
+                'optimization_score': -batch_objective(base[None, :])[0],
+                'convergence': True,
+                'reoptimized_sites': []
+            }
+
+        columns = (3 * sites[:, None] + np.arange(3)).ravel()
+        chunk_size = max(1, self.max_batch_elements // base.size)
+
+        def subset_objective(population):
+            # Embed the changed sites' parameters into the previous full solution
+            scores = np.empty(len(population))
+            for start in range(0, len(population), chunk_size):
+                chunk = population[start:start + chunk_size]
+                candidates = np.repeat(base[None, :], len(chunk), axis=0)
+                candidates[:, columns] = chunk
+                scores[start:start + chunk_size] = batch_objective(candidates)
+            return scores
+
+        rows, init = self._warm_population(state, columns, popsize)
+        result = self.run_optimizer(subset_objective, len(sites), 'genetic', None, maxiter, popsize,
+                                    init=init, x0=base[columns])
+
+        params = base.copy()
+        params[columns] = result.x
+        state['params'] = params
+        # Only re-optimized sites move their reference demand, so slow drift still accumulates
+        state['demand'][sites] = demand[sites]
+        if rows is not None:
+            state['population'][np.ix_(rows, columns)] = result.population
+            state['energies'][rows] = result.population_energies
+
+        return {
+            'optimized_parameters': params,
+            'optimization_score': -result.fun,
+            'convergence': result.success,
+            'reoptimized_sites': sites.tolist()
+        }
+
+    def _remember_solution(self, cell_sites, traffic_patterns, params, population=None, energies=None):
+        '''Store a solution as the warm start for the next run on this topology'''
+        key = self.topology_key(cell_sites)
+        self._warm_starts[key] = {
+            'params': np.array(params, dtype=float),
+            'population': population,
+            'energies': energies,
+            'demand': self._site_demand(traffic_patterns, len(cell_sites)),
+            'n_patterns': len(traffic_patterns)
+        }
+        self._warm_starts.move_to_end(key)
+        if len(self._warm_starts) > self.max_cached_topologies:
+            self._warm_starts.popitem(last=False)
+
+    def _warm_population(self, state, columns, popsize):
+        '''Initial population for the changed parameters, taken from the stored run
+
+        Returns the stored population rows used (None when synthesized) and the
+        (size, len(columns)) initial population.
+        '''
+        size = max(5, popsize * len(columns))
+        if state['population'] is not None and len(state['population']) >= 5:
+            rows = np.argsort(state['energies'])[:size]
+            return rows, state['population'][np.ix_(rows, columns)]
+
+        # No stored population (e.g. after a partitioned run): jitter the previous solution
+        bounds = np.array(SITE_BOUNDS * (len(columns) // 3), dtype=float)
+        lower, upper = bounds[:, 0], bounds[:, 1]
+        rng = np.random.default_rng(42)
+        center = state['params'][columns]
+        init = center + rng.normal(0, 0.05, (size, len(columns))) * (upper - lower)
+        init[0] = center
+        return None, np.clip(init, lower, upper)
+
+    def optimize_antenna_parameters_partitioned(self, cell_sites, traffic_patterns, maxiter=1000,
+                                                popsize=15, max_workers=None, max_cluster_sites=100,
+                                                coupling_threshold=0.0, reconcile_sweeps=10,
+                                                algorithm='genetic', budget=None):
+        '''Optimize weakly coupled site clusters in parallel and merge the results
+
+        Sites are split into connected components of the interference graph
+        (ignoring couplings below coupling_threshold), oversized components are
+        cut by recursive coordinate bisection, and each cluster runs its own
+        differential_evolution in a process-pool worker. Couplings cut by the
+        partition are settled afterwards by a boundary-reconciliation pass.
+        '''
+        n_sites = len(cell_sites)
+        neighbor_index, coupling = self._get_topology(cell_sites)
+        if neighbor_index is None:
+            # Without coordinates every site pair interferes, so there is nothing to split
+            return self.optimize_antenna_parameters(cell_sites, traffic_patterns, maxiter=maxiter,
+                                                    popsize=popsize, algorithm=algorithm, budget=budget)
+
+        clusters = self.partition_sites(neighbor_index, coupling, max_cluster_sites, coupling_threshold)
+        demand = self._site_demand(traffic_patterns, n_sites)
+
+        tasks = []
+        for seed, site_indices in enumerate(self._pack_clusters(clusters, max_cluster_sites)):
+            tasks.append({
+                'site_indices': site_indices,
+                'cell_sites': [cell_sites[i] for i in site_indices],
+                'traffic_patterns': [{'demand': d} for d in demand[site_indices]],
+                'coupling': coupling[site_indices][:, site_indices],
+                'normalizer': n_sites,
+                'algorithm': algorithm,
+                'budget': budget,
+                'maxiter': maxiter,
+                'popsize': popsize,
+                'seed': 42 + seed
+            })
+
+        if max_workers == 1 or len(tasks) == 1:
+            cluster_results = [_optimize_site_cluster(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                cluster_results = list(pool.map(_optimize_site_cluster, tasks))
+
+        params = np.empty(3 * n_sites)
+        site_params = params.reshape(n_sites, 3)
+        for site_indices, cluster_params, _ in cluster_results:
+            site_params[site_indices] = cluster_params.reshape(-1, 3)
+
+        labels = np.empty(n_sites, dtype=int)
+        for label, site_indices in enumerate(clusters):
+            labels[site_indices] = label
+        rows, cols = coupling.nonzero()
+        cut = labels[rows] != labels[cols]
+        boundary = np.unique(rows[cut])
+
+        batch_objective = self.build_batch_objective(cell_sites, traffic_patterns)
+        params, score = self._reconcile_boundary(params, boundary, coupling, demand,
+                                                 batch_objective, reconcile_sweeps)
+        self._remember_solution(cell_sites, traffic_patterns, params)
+
+        return {
+            'optimized_parameters': params,
+            'optimization_score': -score,
+            'convergence': all(success for _, _, success in cluster_results)
+        }
+
+    def partition_sites(self, neighbor_index, coupling, max_cluster_sites, coupling_threshold=0.0):
+        '''Split sites into clusters that share no coupling above coupling_threshold'''
+        from scipy.sparse.csgraph import connected_components
+
+        graph = coupling.multiply(coupling > coupling_threshold) if coupling_threshold > 0 else coupling
+        n_components, labels = connected_components(graph, directed=False)
+        order = np.argsort(labels, kind='stable')
+        components = np.split(order, np.cumsum(np.bincount(labels, minlength=n_components))[:-1])
+
+        points = neighbor_index.tree.data
+        clusters = []
+
+        def bisect(site_indices):
+            if len(site_indices) <= max_cluster_sites:
+                clusters.append(site_indices)
+                return
+            # Recursive coordinate bisection along the widest axis
+            coordinates = points[site_indices]
+            axis = np.argmax(coordinates.max(axis=0) - coordinates.min(axis=0))
+            ordered = site_indices[np.argsort(coordinates[:, axis], kind='stable')]
+            half = len(ordered) // 2
+            bisect(ordered[:half])
+            bisect(ordered[half:])
+
+        for component in components:
+            bisect(component)
+        return clusters
+
+    def _pack_clusters(self, clusters, max_cluster_sites):
+        '''Group small independent clusters into tasks of up to max_cluster_sites sites'''
+        tasks, current, current_sites = [], [], 0
+        for cluster in sorted(clusters, key=len, reverse=True):
+            if current and current_sites + len(cluster) > max_cluster_sites:
+                tasks.append(np.concatenate(current))
+                current, current_sites = [], 0
+            current.append(cluster)
+            current_sites += len(cluster)
+        if current:
+            tasks.append(np.concatenate(current))
+        return tasks
+
+    def _site_demand(self, traffic_patterns, n_sites):
+        '''Per-site traffic demand; sites without a pattern carry no capacity term'''
+        demand = np.zeros(n_sites)
+        for i, pattern in enumerate(traffic_patterns[:n_sites]):
+            demand[i] = pattern.get('demand', 1)
+        return demand
+
+    def _reconcile_boundary(self, params, boundary, coupling, demand, batch_objective, sweeps):
+        '''Re-balance transmit power of sites whose couplings crossed cluster borders
+
+        Tilt and azimuth only affect their own site, so the cluster optima stand;
+        power is the only coupled parameter. Each sweep moves boundary sites to
+        the closed-form best-response power given their neighbors' power, and the
+        best full-objective solution seen is kept.
+        '''
+        best_params = params.copy()
+        best_score = batch_objective(best_params[None, :])[0]
+        if len(boundary) == 0:
+            return best_params, best_score
+
+        n_sites = len(demand)
+        candidate = params.copy()
+        tilt = candidate[0::3]
+        power = candidate[2::3]
+        boundary_coupling = coupling[boundary]
+        coverage_gain = 0.4 * 0.1 * (1 + np.cos(np.radians(tilt[boundary]))) / n_sites
+
+        for _ in range(sweeps):
+            neighbor_power = boundary_coupling @ power
+            # d/dp: coverage_gain + 0.3 * demand / ((10 + p) ln 2) - 0.3 / n * neighbor_power = 0
+            slope = np.log(2) * (0.3 / n_sites * neighbor_power - coverage_gain)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                best_response = np.where(slope > 0, 0.3 * demand[boundary] / slope - 10, 43)
+            power[boundary] = 0.5 * power[boundary] + 0.5 * np.clip(best_response, 20, 43)
+
+            score = batch_objective(candidate[None, :])[0]
+            if score < best_score:
+                best_params, best_score = candidate.copy(), score
+
+        return best_params, best_score
+
+    def build_batch_objective(self, cell_sites, traffic_patterns, coupling=None, normalizer=None):
+        '''Build an objective that scores a whole population of candidates per call
+
+        The returned function takes an array of shape (pop_size, 3 * n_sites) and
+        returns one score per candidate, matching the scalar objective. A cluster
+        of a larger topology passes its own coupling block and the full site count
+        as normalizer so that its score is its share of the global objective.
+        '''
+        n_sites = len(cell_sites)
+        if coupling is None:
+            coupling = self.get_interference_coupling(cell_sites)
+        demand = np.array([pattern.get('demand', 1) for pattern in traffic_patterns], dtype=float)
+
+        # Candidates per chunk so that the (chunk, n_sites) intermediates stay bounded
+        chunk_size = max(1, self.max_batch_elements // max(n_sites, 1))
+
+        def batch_objective(population):
+            scores = np.empty(len(population))
+            for start in range(0, len(population), chunk_size):
+                chunk = population[start:start + chunk_size]
+                coverage_score = self.calculate_coverage_batch(chunk, normalizer)
+                interference_score = self.calculate_interference_batch(chunk, coupling, normalizer)
+                capacity_score = self.calculate_capacity_batch(chunk, demand)
+                scores[start:start + chunk_size] = -(
+                    0.4 * coverage_score + 0.3 * capacity_score - 0.3 * interference_score
+                )
+            return scores
+
+        return batch_objective
+
+    def topology_key(self, cell_sites) -> str:
+        '''Fingerprint of site identities and locations
+
+        Sites without any of id/lat/lon are fingerprinted by position and
+        their full record, so such topologies do not share a cache entry.
+        '''
+        digest = hashlib.blake2b(digest_size=16)
+        for i, site in enumerate(cell_sites):
+            if isinstance(site, dict) and ('id' in site or 'lat' in site or 'lon' in site):
+                fields = (site.get('id'), site.get('lat'), site.get('lon'))
+            else:
+                fields = site
+            digest.update(repr((i, fields)).encode())
+        return digest.hexdigest()
+
+    def _get_topology(self, cell_sites):
+        '''Neighbor index and coupling matrix for a topology, built once and cached'''
+        key = self.topology_key(cell_sites)
+        if key in self._topology_cache:
+            self._topology_cache.move_to_end(key)
+            return self._topology_cache[key]
+
+        if SiteNeighborIndex.has_coordinates(cell_sites):
+            neighbor_index = SiteNeighborIndex(cell_sites, self.interference_radius_km)
+            coupling = neighbor_index.weighted_adjacency(
+                1.0 / (100 + neighbor_index.distances_km * 10)
+            )
+        else:
+            # Without coordinates every site pair interferes (dense fallback)
+            neighbor_index = None
+            coupling = self.interference_coupling(self.site_distance_matrix(cell_sites))
+
+        self._topology_cache[key] = (neighbor_index, coupling)
+        if len(self._topology_cache) > self.max_cached_topologies:
+            self._topology_cache.popitem(last=False)
+        return neighbor_index, coupling
+
+    def get_neighbor_index(self, cell_sites):
+        '''Cached SiteNeighborIndex for the topology, or None when sites lack lat/lon'''
+        return self._get_topology(cell_sites)[0]
+
+    def get_interference_coupling(self, cell_sites):
+        '''Cached pairwise interference weights (sparse when sites have coordinates)'''
+        return self._get_topology(cell_sites)[1]
+
+    def site_distance_matrix(self, cell_sites):
+        '''Dense pairwise distance proxy for sites without coordinates'''
+        # Site index separation, the same distance proxy used by calculate_interference
+        index = np.arange(len(cell_sites), dtype=float)
+        return np.abs(np.subtract.outer(index, index))
+
+    def interference_coupling(self, distances):
+        '''Convert a site distance matrix into pairwise interference weights in place'''
+        coupling = distances
+        coupling *= 10
+        coupling += 100
+        np.reciprocal(coupling, out=coupling)
+        np.fill_diagonal(coupling, 0.0)
+        return coupling
+
     def calculate_coverage(self, params, cell_sites):
         '''Calculate coverage score based on antenna parameters'''
         coverage_areas = []
@@ -45,9 +460,30 @@ class RFOptimizer:
             coverage_areas.append(coverage)
         
         return np.mean(coverage_areas)
-    
-    def calculate_interference(self, params, cell_sites):
-        '''Calculate interference score'''
+
+    def calculate_coverage_batch(self, population, normalizer=None):
+        '''Coverage score for every candidate in a (pop_size, 3 * n_sites) population'''
+        tilt = population[:, 0::3]
+        power = population[:, 2::3]
+        coverage = (power - 20) * (1 + np.cos(np.radians(tilt))) * 0.1
+        return coverage.sum(axis=1) / (normalizer or power.shape[1])
+
+    def calculate_interference(self, params, cell_sites, topology=None):
+        '''Calculate interference score
+
+        topology is the cached (neighbor_index, coupling) pair of cell_sites;
+        it is looked up when omitted.
+        '''
+        neighbor_index = (topology or self._get_topology(cell_sites))[0]
+        if neighbor_index is not None:
+            # Only sites within the interference radius contribute
+            total_interference = 0
+            for (i, j), distance in zip(neighbor_index.pairs, neighbor_index.distances_km):
+                power_i = params[i * 3 + 2]
+                power_j = params[j * 3 + 2]
+                total_interference += (power_i * power_j) / (100 + distance * 10)
+            return total_interference / len(cell_sites)
+
         total_interference = 0
         for i in range(len(cell_sites)):
             for j in range(i + 1, len(cell_sites)):
@@ -58,7 +494,16 @@ class RFOptimizer:
                 total_interference += interference
         
         return total_interference / len(cell_sites)
-    
+
+    def calculate_interference_batch(self, population, coupling, normalizer=None):
+        '''Interference score for every candidate using a symmetric coupling matrix'''
+        power = population[:, 2::3]
+        # Sum over site pairs i < j of p_i * p_j * w_ij, i.e. half the quadratic form;
+        # coupling @ power.T keeps the product sparse-aware when coupling is sparse
+        coupled = np.asarray(coupling @ power.T).T
+        total_interference = 0.5 * np.einsum('si,si->s', coupled, power)
+        return total_interference / (normalizer or power.shape[1])
+
     def calculate_capacity(self, params, traffic_patterns):
         '''Calculate capacity score based on traffic patterns'''
         total_capacity = 0
@@ -69,3 +514,11 @@ class RFOptimizer:
             total_capacity += capacity
         
         return total_capacity
+
+    def calculate_capacity_batch(self, population, demand):
+        '''Capacity score for every candidate given per-pattern traffic demand'''
+        power = population[:, 2::3]
+        served = min(len(demand), power.shape[1])
+        capacity = np.log2(1 + power[:, :served] / 10) @ demand[:served]
+        # Patterns beyond the configured sites fall back to 30 dBm
+        return capacity + demand[served:].sum() * np.log2(1 + 30 / 10)
@@ -0,0 +1,61 @@
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from scipy import sparse
+
+EARTH_RADIUS_KM = 6371.0
+
+class SiteNeighborIndex:
+    '''Geographic neighbor structure over cell sites
+
+    Sites are placed on the unit sphere (scaled to kilometres) and indexed with a
+    KD-tree, so the pairs within the interference radius are found in
+    O(n log n) and every later lookup only touches those k neighbors per site.
+    '''
+
+    def __init__(self, cell_sites, radius_km: float):
+        from scipy.spatial import cKDTree
+
+        self.radius_km = radius_km
+        self.n_sites = len(cell_sites)
+
+        lat = np.radians([site['lat'] for site in cell_sites])
+        lon = np.radians([site['lon'] for site in cell_sites])
+        points = EARTH_RADIUS_KM * np.column_stack([
+            np.cos(lat) * np.cos(lon),
+            np.cos(lat) * np.sin(lon),
+            np.sin(lat)
+        ])
+        self.tree = cKDTree(points)
+
+        # Chord length equivalent of the great-circle radius
+        chord_radius = 2 * EARTH_RADIUS_KM * np.sin(radius_km / (2 * EARTH_RADIUS_KM))
+        pairs = self.tree.query_pairs(chord_radius, output_type='ndarray')
+        self.pairs = pairs.reshape(-1, 2)
+
+        chords = np.linalg.norm(points[self.pairs[:, 0]] - points[self.pairs[:, 1]], axis=1)
+        self.distances_km = 2 * EARTH_RADIUS_KM * np.arcsin(
+            np.minimum(chords / (2 * EARTH_RADIUS_KM), 1.0)
+        )
+
+    @staticmethod
+    def has_coordinates(cell_sites) -> bool:
+        '''True when every site carries lat/lon'''
+        return bool(cell_sites) and all(
+            isinstance(site, dict) and 'lat' in site and 'lon' in site for site in cell_sites
+        )
+
+    def neighbor_counts(self) -> np.ndarray:
+        '''Number of neighbors within the radius for each site'''
+        return np.bincount(self.pairs.ravel(), minlength=self.n_sites)
+
+    def weighted_adjacency(self, weights) -> 'sparse.csr_matrix':
+        '''Symmetric sparse matrix with one weight per neighbor pair'''
+        from scipy import sparse
+
+        rows = np.concatenate([self.pairs[:, 0], self.pairs[:, 1]])
+        cols = np.concatenate([self.pairs[:, 1], self.pairs[:, 0]])
+        data = np.concatenate([weights, weights])
+        return sparse.csr_matrix((data, (rows, cols)), shape=(self.n_sites, self.n_sites))
@@ -1,5 +1,4 @@
 import numpy as np
-from scipy import optimize
 from typing import Dict, List
 
 class NetworkSliceOrchestrator:
@@ -12,6 +11,8 @@ class NetworkSliceOrchestrator:
     
     def optimize_slice_allocation(self, demand_vector: Dict) -> Dict:
         '''Dynamic resource allocation using convex optimization'''
+        from scipy import optimize
+        
         def objective_function(x):
             # Maximize utility while meeting constraints
             utility = sum(np.log(1 + x[i]) for i in range(len(x)))
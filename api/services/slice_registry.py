@@ -0,0 +1,333 @@
+import asyncio
+import json
+import logging
+import time
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field, asdict, replace
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+SLICE_TYPES = {'embb': 'eMBB', 'urllc': 'URLLC', 'mmtc': 'mMTC'}
+SLICE_STATUSES = ('provisioning', 'active', 'suspended')
+
+class SliceQuotaExceeded(Exception):
+    '''The tenant already has MAX_SLICES_PER_TENANT slices'''
+
+@dataclass
+class NetworkSlice:
+    id: str
+    tenant_id: str
+    type: str
+    status: str
+    config: Dict = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    seq: int = 0  # Registry insertion order, used as the pagination cursor
+
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        del data['seq']
+        for timestamp in ('created_at', 'updated_at'):
+            data[timestamp] = datetime.fromtimestamp(data[timestamp], timezone.utc).isoformat().replace('+00:00', 'Z')
+        return data
+
+class SliceRegistry:
+    '''In-memory slice store with secondary indexes and cursor pagination
+
+    Slices are looked up by id in a dict. Tenant, type and status indexes hold
+    the sorted insertion sequence numbers of their slices, so a filtered page
+    starts with a bisect at the cursor and walks the smallest matching index.
+    Every change is handed to an optional write-behind persistence queue, so
+    reads and writes never wait on the database.
+    '''
+
+    def __init__(self, max_slices_per_tenant: int, persistence=None):
+        self.max_slices_per_tenant = max_slices_per_tenant
+        self.persistence = persistence
+        self._slices: Dict[str, NetworkSlice] = {}
+        self._by_seq: Dict[int, NetworkSlice] = {}
+        self._order: List[int] = []
+        self._indexes: Dict[str, Dict[str, List[int]]] = {'tenant_id': {}, 'type': {}, 'status': {}}
+        self._next_seq = 1
+
+    def __len__(self):
+        return len(self._slices)
+
+    @staticmethod
+    def normalize_type(slice_type: str) -> str:
+        canonical = SLICE_TYPES.get(slice_type.lower())
+        if canonical is None:
+            raise ValueError(f'Unknown slice type: {slice_type} (expected one of {", ".join(SLICE_TYPES.values())})')
+        return canonical
+
+    @staticmethod
+    def validate_status(status: str) -> str:
+        if status not in SLICE_STATUSES:
+            raise ValueError(f'Unknown slice status: {status} (expected one of {", ".join(SLICE_STATUSES)})')
+        return status
+
+    def tenant_slice_count(self, tenant_id: str) -> int:
+        return len(self._indexes['tenant_id'].get(tenant_id, ()))
+
+    def create(self, tenant_id: str, slice_type: str, config: Optional[Dict] = None,
+               slice_id: Optional[str] = None, status: str = 'active') -> NetworkSlice:
+        '''Register a new slice, enforcing the per-tenant limit'''
+        slice_type = self.normalize_type(slice_type)
+        status = self.validate_status(status)
+        if slice_id is not None and slice_id in self._slices:
+            raise ValueError(f'Slice {slice_id} already exists')
+        if self.tenant_slice_count(tenant_id) >= self.max_slices_per_tenant:
+            raise SliceQuotaExceeded(
+                f'Tenant {tenant_id} already has {self.max_slices_per_tenant} slices'
+            )
+
+        network_slice = NetworkSlice(
+            id=slice_id or f'{slice_type.lower()}-{uuid4().hex[:12]}',
+            tenant_id=tenant_id,
+            type=slice_type,
+            status=status,
+            config=dict(config or {})
+        )
+        self._insert(network_slice)
+        self._persist('upsert', network_slice)
+        return network_slice
+
+    def get(self, slice_id: str) -> Optional[NetworkSlice]:
+        return self._slices.get(slice_id)
+
+    def update(self, slice_id: str, status: Optional[str] = None, config: Optional[Dict] = None) -> NetworkSlice:
+        '''Change the status and/or merge config changes; raises KeyError for unknown slices'''
+        network_slice = self._slices[slice_id]
+        if status is not None and status != network_slice.status:
+            self.validate_status(status)
+            self._unindex('status', network_slice.status, network_slice.seq)
+            network_slice.status = status
+            self._index('status', status, network_slice.seq)
+        if config:
+            network_slice.config = {**network_slice.config, **config}
+        network_slice.updated_at = time.time()
+        self._persist('upsert', network_slice)
+        return network_slice
+
+    def delete(self, slice_id: str) -> NetworkSlice:
+        '''Remove a slice; raises KeyError for unknown slices'''
+        network_slice = self._slices.pop(slice_id)
+        del self._by_seq[network_slice.seq]
+        del self._order[bisect_left(self._order, network_slice.seq)]
+        for index in self._indexes:
+            self._unindex(index, getattr(network_slice, index), network_slice.seq)
+        self._persist('delete', network_slice)
+        return network_slice
+
+    def list(self, tenant_id: Optional[str] = None, slice_type: Optional[str] = None,
+             status: Optional[str] = None, cursor: Optional[int] = None,
+             limit: int = 50) -> Tuple[List[NetworkSlice], Optional[int]]:
+        '''One page of slices in creation order, and the cursor of the next page (None at the end)'''
+        filters = {}
+        if tenant_id is not None:
+            filters['tenant_id'] = tenant_id
+        if slice_type is not None:
+            filters['type'] = self.normalize_type(slice_type)
+        if status is not None:
+            filters['status'] = status
+
+        # Walk the most selective index and check the remaining filters per slice
+        candidates = self._order
+        for index, value in filters.items():
+            seqs = self._indexes[index].get(value, [])
+            if len(seqs) < len(candidates) or candidates is self._order:
+                candidates = seqs
+
+        page = []
+        position = bisect_right(candidates, cursor) if cursor is not None else 0
+        while position < len(candidates) and len(page) <= limit:
+            network_slice = self._by_seq[candidates[position]]
+            if all(getattr(network_slice, index) == value for index, value in filters.items()):
+                page.append(network_slice)
+            position += 1
+
+        if len(page) > limit:
+            page = page[:limit]
+            return page, page[-1].seq
+        return page, None
+
+    def load(self, slices: List[NetworkSlice]):
+        '''Populate the registry from persisted slices without persisting them again'''
+        for network_slice in sorted(slices, key=lambda s: s.created_at):
+            self._insert(replace(network_slice))
+
+    def _insert(self, network_slice: NetworkSlice):
+        network_slice.seq = self._next_seq
+        self._next_seq += 1
+        self._slices[network_slice.id] = network_slice
+        self._by_seq[network_slice.seq] = network_slice
+        self._order.append(network_slice.seq)
+        for index in self._indexes:
+            self._index(index, getattr(network_slice, index), network_slice.seq)
+
+    def _index(self, index: str, value: str, seq: int):
+        seqs = self._indexes[index].setdefault(value, [])
+        if not seqs or seqs[-1] < seq:
+            seqs.append(seq)
+        else:
+            seqs.insert(bisect_left(seqs, seq), seq)
+
+    def _unindex(self, index: str, value: str, seq: int):
+        seqs = self._indexes[index][value]
+        del seqs[bisect_left(seqs, seq)]
+        if not seqs:
+            del self._indexes[index][value]
+
+    def _persist(self, operation: str, network_slice: NetworkSlice):
+        if self.persistence is not None:
+            self.persistence.enqueue(operation, network_slice)
+
+class SlicePersistence:
+    '''Write-behind persistence of registry changes to PostgreSQL
+
+    Changes are queued without blocking and flushed in batches; several
+    changes to one slice within a batch collapse to the latest. A failed
+    flush is kept and retried with exponential backoff, merged with the
+    changes queued meanwhile. asyncpg is imported on start, and without it
+    (or without a reachable database) the registry runs memory-only.
+    '''
+
+    UPSERT = '''
+        INSERT INTO network_slices (id, tenant_id, slice_type, status, config, created_at, updated_at)
+        VALUES ($1, $2, $3, $4, $5::jsonb, $6, $7)
+        ON CONFLICT (id) DO UPDATE SET
+            tenant_id = EXCLUDED.tenant_id, slice_type = EXCLUDED.slice_type, status = EXCLUDED.status,
+            config = EXCLUDED.config, created_at = EXCLUDED.created_at, updated_at = EXCLUDED.updated_at
+    '''
+    DELETE = 'DELETE FROM network_slices WHERE id = $1'
+    SELECT = 'SELECT id, tenant_id, slice_type, status, config, created_at, updated_at FROM network_slices'
+
+    def __init__(self, database_url: str, batch_size: int = 500, flush_interval: float = 0.5,
+                 max_retry_delay: float = 30.0):
+        self.database_url = database_url
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retry_delay = max_retry_delay
+        self.pool = None
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._stopping = asyncio.Event()
+        self._task = None
+
+    async def start(self) -> bool:
+        '''Connect and start the writer; False when persistence is unavailable'''
+        try:
+            import asyncpg
+            self.pool = await asyncpg.create_pool(self.database_url, min_size=1, max_size=4)
+        except Exception as e:
+            logger.warning(f'Slice persistence unavailable ({e}), keeping slices in memory only')
+            return False
+        self._task = asyncio.create_task(self._run())
+        return True
+
+    async def load_slices(self) -> List[NetworkSlice]:
+        if self.pool is None:
+            return []
+        rows = await self.pool.fetch(self.SELECT)
+        return [
+            NetworkSlice(
+                id=row['id'],
+                tenant_id=row['tenant_id'],
+                type=row['slice_type'],
+                status=row['status'],
+                config=json.loads(row['config']) if isinstance(row['config'], str) else dict(row['config']),
+                created_at=row['created_at'].timestamp(),
+                updated_at=row['updated_at'].timestamp()
+            )
+            for row in rows
+        ]
+
+    def enqueue(self, operation: str, network_slice: NetworkSlice):
+        if self.pool is not None:
+            self._queue.put_nowait((operation, replace(network_slice)))
+
+    async def stop(self):
+        '''Flush the pending changes and close the pool'''
+        if self._task is not None:
+            self._stopping.set()
+            self._queue.put_nowait(None)  # Wakes an idle writer
+            await self._task
+            self._task = None
+            self._stopping.clear()
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def _run(self):
+        pending: Dict[str, Tuple[str, NetworkSlice]] = {}
+        failures = 0
+        while True:
+            if not pending:
+                change = await self._queue.get()
+                if change is not None:
+                    self._collapse(pending, [change])
+            # Batch window, or backoff after a failed flush; cut short by stop()
+            delay = min(self.flush_interval * 2 ** failures, self.max_retry_delay)
+            await self._pause(delay)
+            self._collapse(pending, self._drain())
+            stopping = self._stopping.is_set()
+
+            try:
+                await self._flush(list(pending.values()))
+            except Exception as e:
+                failures += 1
+                if stopping:
+                    logger.error(f'Slice persistence flush of {len(pending)} changes failed on shutdown, '
+                                 f'they are not persisted: {e}')
+                    return
+                logger.error(f'Slice persistence flush of {len(pending)} changes failed, retrying: {e}')
+                continue
+            pending.clear()
+            failures = 0
+            if stopping:
+                return
+
+    async def _pause(self, delay: float):
+        try:
+            await asyncio.wait_for(self._stopping.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+
+    def _drain(self) -> List[Tuple[str, NetworkSlice]]:
+        changes = []
+        while not self._queue.empty():
+            change = self._queue.get_nowait()
+            if change is not None:
+                changes.append(change)
+        return changes
+
+    @staticmethod
+    def _collapse(pending: Dict[str, Tuple[str, NetworkSlice]], changes: List[Tuple[str, NetworkSlice]]):
+        '''Keep only the latest change per slice, in the order slices were first changed'''
+        for operation, network_slice in changes:
+            pending[network_slice.id] = (operation, network_slice)
+
+    async def _flush(self, changes: List[Tuple[str, NetworkSlice]]):
+        if not changes:
+            return
+
+        upserts, deletes = [], []
+        for operation, network_slice in changes:
+            if operation == 'delete':
+                deletes.append((network_slice.id,))
+            else:
+                upserts.append((
+                    network_slice.id, network_slice.tenant_id, network_slice.type, network_slice.status,
+                    json.dumps(network_slice.config, default=str),
+                    datetime.fromtimestamp(network_slice.created_at, timezone.utc),
+                    datetime.fromtimestamp(network_slice.updated_at, timezone.utc)
+                ))
+
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                for start in range(0, len(upserts), self.batch_size):
+                    await connection.executemany(self.UPSERT, upserts[start:start + self.batch_size])
+                if deletes:
+                    await connection.executemany(self.DELETE, deletes)
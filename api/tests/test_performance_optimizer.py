@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+from core.performance_optimizer import PerformanceOptimizer
+
+fakeredis = pytest.importorskip('fakeredis')
+
+class CountingQuery:
+    '''query_func stand-in that counts calls and returns a new value per call'''
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self, site_id):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return {'site': site_id, 'version': self.calls}
+
+def make_optimizer(server=None, **options):
+    redis_client = fakeredis.FakeAsyncRedis(server=server) if server is not None else None
+    return PerformanceOptimizer(redis_client=redis_client, **options)
+
+def test_local_tier_serves_repeat_lookups():
+    async def scenario():
+        optimizer = make_optimizer(fakeredis.FakeServer())
+        query = CountingQuery()
+        first = await optimizer.cached_network_query('site:1', query, 1)
+        second = await optimizer.cached_network_query('site:1', query, 1)
+        return optimizer.cache_stats(), query.calls, first, second
+
+    stats, calls, first, second = asyncio.run(scenario())
+    assert calls == 1
+    assert first == second == {'site': 1, 'version': 1}
+    assert (stats['misses'], stats['local_hits'], stats['hit_ratio']) == (1, 1, 0.5)
+
+def test_redis_tier_is_shared_between_instances():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        query = CountingQuery()
+        await make_optimizer(server).cached_network_query('site:1', query, 1)
+        # A second worker has an empty local tier but the same Redis
+        other = make_optimizer(server)
+        result = await other.cached_network_query('site:1', query, 1)
+        return other.cache_stats(), query.calls, result
+
+    stats, calls, result = asyncio.run(scenario())
+    assert calls == 1
+    assert result == {'site': 1, 'version': 1}
+    assert (stats['redis_hits'], stats['misses']) == (1, 0)
+
+def test_concurrent_misses_share_one_query():
+    async def scenario():
+        optimizer = make_optimizer(fakeredis.FakeServer())
+        query = CountingQuery(delay=0.05)
+        results = await asyncio.gather(*[
+            optimizer.cached_network_query('site:1', query, 1) for _ in range(20)
+        ])
+        return optimizer.cache_stats(), query.calls, results
+
+    stats, calls, results = asyncio.run(scenario())
+    assert calls == 1
+    assert all(result == {'site': 1, 'version': 1} for result in results)
+    # Waiters count as lookups that were not hits
+    assert (stats['misses'], stats['coalesced'], stats['lookups']) == (1, 19, 20)
+    assert stats['hit_ratio'] == 0.0
+
+def test_stale_entries_are_served_while_one_refresh_runs():
+    async def scenario():
+        optimizer = make_optimizer(fakeredis.FakeServer(), local_ttl=0.05, stale_ttl=60)
+        query = CountingQuery(delay=0.05)
+        await optimizer.cached_network_query('site:1', query, 1)
+        await asyncio.sleep(0.1)
+
+        # Past the TTL: every caller gets the stale value at once, one refresh starts
+        stale = await asyncio.gather(*[
+            optimizer.cached_network_query('site:1', query, 1) for _ in range(5)
+        ])
+        await asyncio.gather(*optimizer._refresh_tasks.values())
+        refreshed = await optimizer.cached_network_query('site:1', query, 1)
+        return optimizer.cache_stats(), query.calls, stale, refreshed
+
+    stats, calls, stale, refreshed = asyncio.run(scenario())
+    assert all(value['version'] == 1 for value in stale)
+    assert refreshed['version'] == 2
+    assert calls == 2
+    assert (stats['stale_hits'], stats['refreshes'], stats['misses']) == (5, 1, 1)
+
+def test_failed_refresh_keeps_the_stale_value():
+    async def scenario():
+        optimizer = make_optimizer(local_ttl=0.01, stale_ttl=60)
+        await optimizer.cached_network_query('site:1', CountingQuery(), 1)
+        await asyncio.sleep(0.05)
+
+        async def failing_query(site_id):
+            raise ConnectionError('element unreachable')
+
+        stale = await optimizer.cached_network_query('site:1', failing_query, 1)
+        await asyncio.gather(*optimizer._refresh_tasks.values(), return_exceptions=True)
+        again = await optimizer.cached_network_query('site:1', failing_query, 1)
+        return stale, again
+
+    stale, again = asyncio.run(scenario())
+    assert stale == again == {'site': 1, 'version': 1}
+
+def test_unavailable_redis_falls_back_to_the_local_tier():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        server.connected = False
+        optimizer = make_optimizer(server)
+        query = CountingQuery()
+        first = await optimizer.cached_network_query('site:1', query, 1)
+        second = await optimizer.cached_network_query('site:1', query, 1)
+        return optimizer.cache_stats(), query.calls, first, second
+
+    stats, calls, first, second = asyncio.run(scenario())
+    assert calls == 1
+    assert first == second
+    # The failed GET and SETEX of the miss
+    assert stats['redis_errors'] == 2
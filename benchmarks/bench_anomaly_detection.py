@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Anomaly detection over cell KPI samples: batch DBSCAN(eps=0.5, min_samples=5)
+refitted on the whole frame (the previous detector) versus the streaming EWMA
+detector in AdvancedNetworkAnalytics.
+
+DBSCAN's neighbourhood queries grow super-linearly and its memory with the
+number of neighbours, so it is run on prefixes up to --dbscan-max samples and
+its 1M-sample time is extrapolated from the largest prefix. Injected spikes
+give a precision/recall estimate for both detectors.
+
+Usage: python benchmarks/bench_anomaly_detection.py [--samples 1000000] [--cells 1000] [--n-jobs 8]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+
+from services.advanced_analytics import AdvancedNetworkAnalytics, StreamingAnomalyDetector  # noqa: E402
+
+METRICS = ['prb_utilization', 'throughput', 'latency', 'packet_loss', 'sinr', 'active_users']
+
+
+def make_metrics(n_samples, n_cells, anomaly_rate, rng):
+    """Per-cell KPI samples in time order with a daily cycle and injected spikes"""
+    cell = np.tile(np.arange(n_cells), n_samples // n_cells + 1)[:n_samples]
+    step = np.arange(n_samples) // n_cells
+    daily = np.sin(2 * np.pi * (step % 96) / 96)  # 15-minute samples
+    base = rng.uniform(0.5, 1.5, size=(n_cells, len(METRICS)))
+
+    scale = np.array([50, 400, 12, 0.5, 15, 120])
+    noise = np.array([3, 25, 1, 0.05, 1, 8])
+    values = base[cell] * scale * (1 + 0.1 * daily[:, None]) + rng.normal(size=(n_samples, len(METRICS))) * noise
+
+    injected = rng.random(n_samples) < anomaly_rate
+    injected &= step >= 60  # Past the detector warmup
+    metric = rng.integers(0, len(METRICS), n_samples)
+    rows = np.flatnonzero(injected)
+    values[rows, metric[rows]] += rng.choice([-1, 1], len(rows)) * 10 * noise[metric[rows]]
+
+    frame = pd.DataFrame(values, columns=METRICS)
+    frame.insert(0, 'cell_id', cell)
+    frame.insert(0, 'timestamp', pd.Timestamp('2026-01-01') + pd.to_timedelta(step * 15, unit='min'))
+    return frame, injected
+
+
+def precision_recall(flagged, injected):
+    true_positives = np.sum(flagged & injected)
+    precision = true_positives / max(np.sum(flagged), 1)
+    recall = true_positives / max(np.sum(injected), 1)
+    return precision, recall
+
+
+def run_dbscan(frame, n):
+    """The previous path: standardized features, one DBSCAN fit over everything"""
+    from sklearn.cluster import DBSCAN
+
+    features = frame[METRICS].to_numpy()[:n]
+    features = (features - features.mean(axis=0)) / features.std(axis=0)
+    started = time.perf_counter()
+    labels = DBSCAN(eps=0.5, min_samples=5).fit_predict(features)
+    return time.perf_counter() - started, labels == -1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--samples', type=int, default=1_000_000)
+    parser.add_argument('--cells', type=int, default=1000)
+    parser.add_argument('--anomaly-rate', type=float, default=0.001)
+    parser.add_argument('--dbscan-max', type=int, default=100_000,
+                        help='largest frame DBSCAN is run on')
+    parser.add_argument('--n-jobs', type=int, default=os.cpu_count(),
+                        help='worker processes for the partitioned per-cell mode')
+    parser.add_argument('--stream-samples', type=int, default=100_000,
+                        help='samples fed one at a time through process_sample')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    frame, injected = make_metrics(args.samples, args.cells, args.anomaly_rate, rng)
+    print(f"{args.samples} samples, {args.cells} cells, {len(METRICS)} metrics, {injected.sum()} injected anomalies")
+    print(f"{'detector':<36}{'samples':>10}{'seconds':>10}{'us/sample':>11}{'precision':>11}{'recall':>8}")
+
+    def report(name, n, seconds, flagged):
+        precision, recall = precision_recall(flagged, injected[:n])
+        print(f"{name:<36}{n:>10}{seconds:>10.2f}{seconds / n * 1e6:>11.2f}{precision:>11.2f}{recall:>8.2f}")
+
+    sizes = [n for n in (10_000, 30_000, 100_000, 300_000, args.samples) if n <= min(args.dbscan_max, args.samples)]
+    timings = []
+    for n in sizes:
+        seconds, flagged = run_dbscan(frame, n)
+        timings.append(seconds)
+        report('DBSCAN refit', n, seconds, flagged)
+    if len(sizes) > 1 and sizes[-1] < args.samples:
+        # Extrapolate with the growth exponent between the two largest runs
+        exponent = np.log(timings[-1] / timings[-2]) / np.log(sizes[-1] / sizes[-2])
+        estimate = timings[-1] * (args.samples / sizes[-1]) ** max(exponent, 1.0)
+        print(f"{'DBSCAN refit (extrapolated)':<36}{args.samples:>10}{estimate:>10.0f}"
+              f"{estimate / args.samples * 1e6:>11.2f}   (n^{max(exponent, 1.0):.2f})")
+
+    detector = StreamingAnomalyDetector(len(METRICS))
+    started = time.perf_counter()
+    _, flagged = detector.score_batch(frame[METRICS].to_numpy(), frame['cell_id'].to_numpy())
+    report('streaming EWMA, score_batch', args.samples, time.perf_counter() - started, flagged)
+
+    analytics = AdvancedNetworkAnalytics()
+    started = time.perf_counter()
+    analytics.detect_network_anomalies(frame)
+    report('streaming EWMA, full report', args.samples, time.perf_counter() - started, flagged)
+
+    if args.n_jobs > 1:
+        analytics = AdvancedNetworkAnalytics()
+        started = time.perf_counter()
+        analytics.detect_network_anomalies(frame, n_jobs=args.n_jobs)
+        report(f'per-cell partitions, {args.n_jobs} procs', args.samples, time.perf_counter() - started, flagged)
+        analytics.close()
+
+    analytics = AdvancedNetworkAnalytics()
+    records = frame.head(args.stream_samples).to_dict('records')
+    started = time.perf_counter()
+    flagged = np.array([analytics.process_sample(record) is not None for record in records])
+    report('streaming EWMA, one sample at a time', len(records), time.perf_counter() - started, flagged)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Per-request authentication overhead: JWT decode + HMAC verification on every
+request versus the verified-token cache in SecurityManager, plus permission
+checks against a list versus the per-token frozenset.
+
+Usage: python benchmarks/bench_auth.py [--requests 100000] [--tokens 500]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import jwt
+from fastapi.security import HTTPAuthorizationCredentials
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+
+from core.security import SecurityManager  # noqa: E402
+
+SECRET_KEY = 'benchmark-secret-key-with-32-bytes-or-more'
+PERMISSIONS = [f'network:{resource}:{action}'
+               for resource in ('slices', 'spectrum', 'rf', 'capacity', 'alerts', 'elements')
+               for action in ('read', 'write', 'admin')]
+
+
+def make_credentials(n_tokens):
+    expires = int(time.time()) + 30 * 60
+    return [
+        HTTPAuthorizationCredentials(scheme='Bearer', credentials=jwt.encode(
+            {'sub': f'noc-operator-{i}', 'exp': expires, 'permissions': PERMISSIONS},
+            SECRET_KEY, algorithm='HS256'
+        ))
+        for i in range(n_tokens)
+    ]
+
+
+def per_request_us(manager, credentials, n_requests, required_permission, resolve_once):
+    started = time.perf_counter()
+    for i in range(n_requests):
+        token = credentials[i % len(credentials)]
+        verified = manager.authenticate(token)
+        if resolve_once:
+            manager.check_permissions(required_permission, verified)
+        else:
+            # Previous flow: scan the permission claim list on every check
+            manager.check_permissions(required_permission, PERMISSIONS)
+    return (time.perf_counter() - started) / n_requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=100_000)
+    parser.add_argument('--tokens', type=int, default=500, help='distinct dashboard sessions')
+    args = parser.parse_args()
+
+    credentials = make_credentials(args.tokens)
+    required_permission = PERMISSIONS[-1]
+
+    print(f"{args.requests} authenticated requests over {args.tokens} tokens")
+    print(f"{'mode':<40}{'us/request':>12}")
+    uncached = SecurityManager(SECRET_KEY, max_cached_tokens=0)
+    print(f"{'decode per request, list permissions':<40}"
+          f"{per_request_us(uncached, credentials, args.requests, required_permission, False):>12.2f}")
+    cached = SecurityManager(SECRET_KEY)
+    print(f"{'verified-token cache, frozenset':<40}"
+          f"{per_request_us(cached, credentials, args.requests, required_permission, True):>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Throughput of network configuration updates against local stub vendor APIs:
+fixed batches of 50 (the previous implementation) versus the bounded-concurrency
+pipeline in PerformanceOptimizer.
+
+Each vendor stub answers after a lognormal delay with a slow tail and fails a
+fraction of requests with 503 to exercise retries.
+
+Usage: python benchmarks/bench_update_pipeline.py [--updates 10000] [--latency-ms 20]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+
+from core.performance_optimizer import NetworkUpdatePipeline  # noqa: E402
+
+VENDORS = ['ericsson', 'nokia', 'samsung']
+
+
+class StubVendorServer:
+    """Minimal HTTP/1.1 keep-alive server that accepts configuration PUTs"""
+
+    def __init__(self, latency_ms, slow_fraction, failure_rate, rng):
+        self.latency = latency_ms / 1000
+        self.slow_fraction = slow_fraction
+        self.failure_rate = failure_rate
+        self.rng = rng
+        self.requests = 0
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, '127.0.0.1', 0)
+        return f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b'\r\n\r\n')
+                length = 0
+                for line in head.split(b'\r\n'):
+                    if line.lower().startswith(b'content-length:'):
+                        length = int(line.split(b':', 1)[1])
+                await reader.readexactly(length)
+                self.requests += 1
+
+                delay = self.latency * self.rng.lognormvariate(0, 0.5)
+                if self.rng.random() < self.slow_fraction:
+                    delay *= 20  # Slow element
+                await asyncio.sleep(delay)
+
+                if self.rng.random() < self.failure_rate:
+                    status, body = b'503 Service Unavailable', b'{"status":"busy"}'
+                else:
+                    status, body = b'200 OK', b'{"status":"applied"}'
+                writer.write(b'HTTP/1.1 ' + status + b'\r\nContent-Type: application/json\r\n'
+                             b'Content-Length: ' + str(len(body)).encode() + b'\r\n\r\n' + body)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+
+async def fixed_batches(pipeline, updates, batch_size=50):
+    """Previous behaviour: each batch of 50 waits for its slowest update"""
+    results = []
+    for start in range(0, len(updates), batch_size):
+        batch = updates[start:start + batch_size]
+        results.extend(await asyncio.gather(
+            *(pipeline.process_single_update(update) for update in batch), return_exceptions=True
+        ))
+    return results
+
+
+async def pipelined(pipeline, updates):
+    results = [None] * len(updates)
+    async for index, result in pipeline.stream(updates):
+        results[index] = result
+    return results
+
+
+async def run(args):
+    rng = random.Random(42)
+    servers = {vendor: StubVendorServer(args.latency_ms, args.slow_fraction, args.failure_rate, rng)
+               for vendor in VENDORS}
+    endpoints = {vendor: await server.start() for vendor, server in servers.items()}
+    updates = [
+        {'vendor': VENDORS[i % len(VENDORS)], 'element_id': f'gnb-{i:05d}', 'parameters': {'tilt': i % 15}}
+        for i in range(args.updates)
+    ]
+
+    print(f"{args.updates} updates, {args.latency_ms} ms median latency, "
+          f"{args.slow_fraction:.0%} slow, {args.failure_rate:.0%} transient failures")
+    print(f"{'mode':<28}{'seconds':>10}{'updates/s':>12}{'failed':>9}{'requests':>10}")
+    modes = [
+        ('fixed batches of 50', lambda pipeline: fixed_batches(pipeline, updates)),
+        (f'pipeline ({args.concurrency} in flight)', lambda pipeline: pipelined(pipeline, updates)),
+    ]
+    for name, mode in modes:
+        pipeline = NetworkUpdatePipeline(endpoints, max_concurrent=args.concurrency,
+                                         max_per_vendor=args.per_vendor)
+        for server in servers.values():
+            server.requests = 0
+        started = time.perf_counter()
+        results = await mode(pipeline)
+        elapsed = time.perf_counter() - started
+        await pipeline.close()
+
+        failed = sum(isinstance(result, Exception) for result in results)
+        requests = sum(server.requests for server in servers.values())
+        print(f"{name:<28}{elapsed:>10.2f}{len(updates) / elapsed:>12.0f}{failed:>9d}{requests:>10d}")
+
+    for server in servers.values():
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--updates', type=int, default=10_000)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--slow-fraction', type=float, default=0.01)
+    parser.add_argument('--failure-rate', type=float, default=0.02)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--per-vendor', type=int, default=100)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
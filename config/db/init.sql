@@ -7,3 +7,15 @@ CREATE TABLE network_elements (
     location_lon DECIMAL(11,8),
     created_at TIMESTAMP DEFAULT NOW()
 );
+
+-- Network slices, written behind by the API slice registry
+CREATE TABLE network_slices (
+    id VARCHAR(64) PRIMARY KEY,
+    tenant_id VARCHAR(64) NOT NULL,
+    slice_type VARCHAR(16) NOT NULL,
+    status VARCHAR(16) NOT NULL,
+    config JSONB NOT NULL DEFAULT '{}',
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+CREATE INDEX idx_network_slices_tenant ON network_slices(tenant_id);
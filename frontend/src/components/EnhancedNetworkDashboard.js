@@ -15,30 +15,89 @@ import {
   LinearProgress
 } from '@mui/material';
 
+const WEBSOCKET_URL = process.env.REACT_APP_WEBSOCKET_URL || 'ws://localhost:8080/ws';
+
+// Apply a delta frame: changed keys only, nested objects merged, lists replaced
+function mergeDelta(current, delta) {
+  const merged = { ...current };
+  Object.entries(delta).forEach(([key, value]) => {
+    if (value === null) {
+      delete merged[key];
+    } else if (typeof value === 'object' && !Array.isArray(value) &&
+               typeof merged[key] === 'object' && !Array.isArray(merged[key])) {
+      merged[key] = mergeDelta(merged[key], value);
+    } else {
+      merged[key] = value;
+    }
+  });
+  return merged;
+}
+
 function EnhancedNetworkDashboard() {
   const [networkMetrics, setNetworkMetrics] = useState({});
   const [slicePerformance, setSlicePerformance] = useState([]);
   const [anomalies, setAnomalies] = useState([]);
   
   useEffect(() => {
-    const fetchDashboardData = async () => {
-      try {
-        const [metricsRes, slicesRes, anomaliesRes] = await Promise.all([
-          fetch('/api/v1/performance/metrics'),
-          fetch('/api/v1/slicing/performance'),
-          fetch('/api/v1/analytics/anomalies')
-        ]);
+    // Performance and slice metrics are pushed by the server on every tick
+    const setters = { performance: setNetworkMetrics, slices: setSlicePerformance };
+    let socket;
+    let reconnectTimer;
+    let retryDelay = 1000;
+    let closed = false;
+    // Frames arrive as binary UTF-8 JSON
+    const decoder = new TextDecoder();
+    
+    const connect = () => {
+      socket = new WebSocket(`${WEBSOCKET_URL}?topics=${Object.keys(setters).join(',')}`);
+      socket.binaryType = 'arraybuffer';
+      
+      socket.onopen = () => {
+        retryDelay = 1000;
+      };
+      
+      socket.onmessage = (event) => {
+        const message = JSON.parse(typeof event.data === 'string' ? event.data : decoder.decode(event.data));
+        const setter = setters[message.topic];
+        if (!setter) return;
         
-        setNetworkMetrics(await metricsRes.json());
-        setSlicePerformance(await slicesRes.json());
+        if (message.type === 'snapshot') {
+          setter(message.data);
+        } else {
+          setter((current) => mergeDelta(current, message.data));
+        }
+      };
+      
+      socket.onclose = () => {
+        // The server sends full snapshots again after a reconnect
+        if (!closed) {
+          reconnectTimer = setTimeout(connect, retryDelay);
+          retryDelay = Math.min(retryDelay * 2, 30000);
+        }
+      };
+    };
+    
+    connect();
+    
+    return () => {
+      closed = true;
+      clearTimeout(reconnectTimer);
+      socket.close();
+    };
+  }, []);
+  
+  useEffect(() => {
+    const fetchAnomalies = async () => {
+      try {
+        const anomaliesRes = await fetch('/api/v1/analytics/anomalies');
         setAnomalies(await anomaliesRes.json());
       } catch (error) {
         console.error('Dashboard data fetch failed:', error);
       }
     };
     
-    fetchDashboardData();
-    const interval = setInterval(fetchDashboardData, 5000);
+    fetchAnomalies();
+    const interval = setInterval(fetchAnomalies, 5000);
     
     return () => clearInterval(interval);
   }, []);
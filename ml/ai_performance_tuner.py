@@ -1,14 +1,29 @@
-import tensorflow as tf
 import numpy as np
 from typing import Dict, List
 
 class AIPerformanceTuner:
     def __init__(self):
-        self.lstm_model = self.build_traffic_prediction_model()
-        self.optimization_model = self.build_parameter_optimization_model()
+        # Keras models are built and compiled on first use; importing TensorFlow
+        # alone takes seconds, which workers that never tune should not pay
+        self._lstm_model = None
+        self._optimization_model = None
+    
+    @property
+    def lstm_model(self):
+        if self._lstm_model is None:
+            self._lstm_model = self.build_traffic_prediction_model()
+        return self._lstm_model
+    
+    @property
+    def optimization_model(self):
+        if self._optimization_model is None:
+            self._optimization_model = self.build_parameter_optimization_model()
+        return self._optimization_model
     
     def build_traffic_prediction_model(self):
         '''LSTM model for traffic pattern prediction'''
+        import tensorflow as tf
+        
         model = tf.keras.Sequential([
             tf.keras.layers.LSTM(128, return_sequences=True, input_shape=(24, 10)),
             tf.keras.layers.Dropout(0.2),
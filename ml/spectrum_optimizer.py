@@ -3,16 +3,47 @@ Advanced Spectrum Optimization Engine
 Implements machine learning algorithms for dynamic spectrum allocation and interference mitigation
 """
 
+import heapq
+import os
+import re
+from datetime import datetime, timezone
 import numpy as np
-import pandas as pd
-from typing import Dict, List, Tuple, Optional
-from sklearn.cluster import KMeans
-from sklearn.ensemble import RandomForestRegressor
-from scipy.optimize import differential_evolution
+from typing import TYPE_CHECKING, Dict, List, Optional
 import logging
 
+# pandas, scikit-learn, scipy and joblib are imported where they are used so
+# that importing this module stays cheap
+if TYPE_CHECKING:
+    import pandas as pd
+    from scipy.sparse import csr_matrix
+    from sklearn.ensemble import RandomForestRegressor
+
 logger = logging.getLogger(__name__)
 
+# Carrier aggregation cost model: per-unit cost of allocated carrier share
+CARRIER_SPECTRUM_COST = 0.1
+CARRIERS_PER_USER = 3
+
+NOISE_FLOOR_DBM = -110
+
+# Per-band accumulator columns: measurements, active measurements (above the
+# noise floor), measurements with a power reading, and the first two moments
+# of power relative to the noise floor
+BAND_STAT_COUNT, BAND_STAT_ACTIVE, BAND_STAT_POWER_COUNT, BAND_STAT_SUM, BAND_STAT_SUMSQ = range(5)
+
+EARTH_RADIUS_KM = 6371.0
+
+# Trained interference models are stored as versioned joblib artifacts in
+# MODEL_DIR (mounted at /app/models in the containers)
+DEFAULT_MODEL_DIR = os.environ.get(
+    'MODEL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+)
+INTERFERENCE_MODEL_PREFIX = 'interference_model'
+INTERFERENCE_MODEL_PATTERN = re.compile(rf'^{INTERFERENCE_MODEL_PREFIX}-v(\d+)\.joblib$')
+INTERFERENCE_FEATURES = [
+    'n_cells', 'frequency_reuse_factor', 'average_cell_distance', 'power_level', 'n_frequencies'
+]
+
 
 class SpectrumOptimizer:
     """
@@ -20,85 +51,179 @@ class SpectrumOptimizer:
     and dynamic allocation algorithms
     """
     
-    def __init__(self):
-        self.interference_model = RandomForestRegressor(n_estimators=100, random_state=42)
+    def __init__(self, model_dir: Optional[str] = None):
+        self.model_dir = model_dir or DEFAULT_MODEL_DIR
+        self.interference_model = None
+        self.interference_model_info: Optional[Dict] = None
         self.allocation_history = []
+        self.frequency_assignment = FrequencyAssignmentEngine()
         self.frequency_bands = {
             'low_band': {'range': (700, 900), 'characteristics': 'wide_coverage'},
             'mid_band': {'range': (1800, 2600), 'characteristics': 'balanced'},
             'high_band': {'range': (3400, 3800), 'characteristics': 'high_capacity'},
             'mmwave': {'range': (26000, 29000), 'characteristics': 'ultra_capacity'}
         }
+        
+        # Load the latest trained interference model once, at startup
+        self.load_interference_model()
     
-    def analyze_spectrum_utilization(self, measurements: pd.DataFrame) -> Dict:
+    def analyze_spectrum_utilization(self, 
+                                     measurements: 'pd.DataFrame', 
+                                     by_cell: bool = False) -> Dict:
         """
         Analyze current spectrum utilization patterns across frequency bands
         
+        Every measurement is binned to its band once and all band statistics
+        come out of a single grouped aggregation, so the frame is scanned once
+        regardless of the number of bands.
+        
         Args:
             measurements: DataFrame with columns ['frequency', 'power', 'timestamp', 'cell_id']
+            by_cell: Return the per-band analysis for every cell_id instead of
+                for the whole frame
         
         Returns:
             Dict containing utilization metrics and recommendations
+            (keyed by cell_id first when by_cell is set)
         """
-        utilization_stats = {}
+        import pandas as pd
+        
+        frequency = measurements['frequency'].to_numpy(dtype=float)
+        power = measurements['power'].to_numpy(dtype=float)
+        
+        if not by_cell:
+            band_stats = self._accumulate_band_statistics(frequency, power)
+            return self._summarize_band_statistics(band_stats[0])
+        
+        cell_codes, cell_ids = pd.factorize(measurements['cell_id'])
+        band_stats = self._accumulate_band_statistics(frequency, power, cell_codes, len(cell_ids))
+        
+        return {
+            cell_id: self._summarize_band_statistics(band_stats[code])
+            for code, cell_id in enumerate(cell_ids)
+        }
+    
+    def analyze_spectrum_utilization_stream(self,
+                                            source,
+                                            file_format: str = 'parquet',
+                                            by_cell: bool = False,
+                                            batch_size: int = 1_000_000) -> Dict:
+        """
+        Streaming variant of analyze_spectrum_utilization over Parquet/Arrow files
+        
+        Measurements are read in column-projected record batches and folded
+        into running per-band accumulators, so memory stays bounded by one
+        batch no matter how many scan files are fed in. Results match the
+        in-memory analysis of the concatenated data.
+        
+        Args:
+            source: File path, list of paths, directory or pyarrow dataset of
+                measurements with columns ['frequency', 'power', 'timestamp', 'cell_id']
+            file_format: 'parquet' or 'arrow' (IPC/Feather)
+            by_cell: Return the per-band analysis for every cell_id
+            batch_size: Maximum rows per record batch
+        
+        Returns:
+            Dict containing utilization metrics and recommendations
+            (keyed by cell_id first when by_cell is set)
+        """
+        try:
+            import pyarrow.dataset as ds
+        except ImportError as exc:
+            raise ImportError("pyarrow is required for streaming spectrum analysis") from exc
+        
+        import pandas as pd
         
-        for band_name, band_info in self.frequency_bands.items():
-            freq_min, freq_max = band_info['range']
-            band_data = measurements[
-                (measurements['frequency'] >= freq_min) & 
-                (measurements['frequency'] <= freq_max)
-            ]
+        dataset = source if isinstance(source, ds.Dataset) else ds.dataset(source, format=file_format)
+        # Only the columns the band statistics need are read from disk
+        columns = ['frequency', 'power'] + (['cell_id'] if by_cell else [])
+        
+        n_bands = len(self.frequency_bands)
+        totals = np.zeros((0 if by_cell else 1, n_bands, 5))
+        cell_codes: Dict = {}
+        
+        for batch in dataset.to_batches(columns=columns, batch_size=batch_size):
+            frequency = batch.column('frequency').to_numpy(zero_copy_only=False).astype(float)
+            power = batch.column('power').to_numpy(zero_copy_only=False).astype(float)
+            
+            if not by_cell:
+                totals += self._accumulate_band_statistics(frequency, power)
+                continue
             
-            if not band_data.empty:
-                utilization = self._calculate_band_utilization(band_data)
-                efficiency = self._calculate_spectral_efficiency(band_data)
-                interference = self._detect_interference(band_data)
-                
-                utilization_stats[band_name] = {
-                    'utilization_percentage': utilization,
-                    'spectral_efficiency': efficiency,
-                    'interference_level': interference,
-                    'recommendation': self._generate_recommendation(utilization, interference)
-                }
+            batch_codes, batch_cells = pd.factorize(batch.column('cell_id').to_pandas())
+            for cell_id in batch_cells:
+                cell_codes.setdefault(cell_id, len(cell_codes))
+            global_codes = np.array([cell_codes[cell_id] for cell_id in batch_cells], dtype=np.intp)
+            
+            if len(cell_codes) > len(totals):
+                # Grow geometrically so new cells cost amortized O(1)
+                grown = np.zeros((max(len(cell_codes), 2 * len(totals)), n_bands, 5))
+                grown[:len(totals)] = totals
+                totals = grown
+            
+            group_codes = np.where(batch_codes >= 0, global_codes[np.clip(batch_codes, 0, None)], -1)
+            totals[:len(cell_codes)] += self._accumulate_band_statistics(
+                frequency, power, group_codes, len(cell_codes)
+            )
         
-        return utilization_stats
+        if not by_cell:
+            return self._summarize_band_statistics(totals[0])
+        
+        return {
+            cell_id: self._summarize_band_statistics(totals[code])
+            for cell_id, code in cell_codes.items()
+        }
     
-    def optimize_carrier_aggregation(self, user_requirements: List[Dict]) -> Dict:
+    def optimize_carrier_aggregation(self, 
+                                     user_requirements: List[Dict],
+                                     solver: str = 'decomposed') -> Dict:
         """
         Optimize carrier aggregation configuration for multiple users
         
         Args:
             user_requirements: List of dicts with user QoS requirements
+            solver: 'decomposed' solves every user independently in closed form
+                (the cost is a sum of per-user terms), 'differential_evolution'
+                runs the global search with a population-vectorized objective
         
         Returns:
             Optimized carrier aggregation configuration
         """
+        required_throughput = np.array(
+            [user['required_throughput'] for user in user_requirements], dtype=float
+        )
+        n_users = len(required_throughput)
+        
+        if solver == 'decomposed':
+            allocation = self._solve_user_carrier_allocation(required_throughput)
+            cost = self._carrier_aggregation_cost(allocation[np.newaxis], required_throughput)[0]
+            return {
+                'optimized_allocation': allocation.ravel(),
+                'optimization_score': float(cost),
+                'convergence': True
+            }
+        
+        if solver != 'differential_evolution':
+            raise ValueError(f"Unknown carrier aggregation solver: {solver}")
+        
         def objective_function(x):
-            """Objective function for carrier aggregation optimization"""
-            total_cost = 0
-            for i, user in enumerate(user_requirements):
-                required_throughput = user['required_throughput']
-                allocated_carriers = x[i * 3:(i + 1) * 3]  # 3 carriers per user
-                
-                achieved_throughput = self._calculate_throughput(allocated_carriers)
-                
-                # Penalty for not meeting requirements
-                if achieved_throughput < required_throughput:
-                    total_cost += (required_throughput - achieved_throughput) ** 2
-                
-                # Cost for using spectrum resources
-                total_cost += np.sum(allocated_carriers) * 0.1
-            
-            return total_cost
+            """Cost of every candidate; scipy passes the population as (3 * U, pop_size)"""
+            population = np.atleast_2d(x.T).reshape(-1, n_users, CARRIERS_PER_USER)
+            costs = self._carrier_aggregation_cost(population, required_throughput)
+            return costs if x.ndim == 2 else costs[0]
+        
+        from scipy.optimize import differential_evolution
         
         # Optimization bounds (0-1 for each carrier allocation)
-        bounds = [(0, 1) for _ in range(len(user_requirements) * 3)]
+        bounds = [(0, 1) for _ in range(n_users * CARRIERS_PER_USER)]
         
         result = differential_evolution(
             objective_function, 
             bounds, 
             maxiter=1000,
-            seed=42
+            seed=42,
+            vectorized=True,
+            updating='deferred'
         )
         
         return {
@@ -120,24 +245,128 @@ class SpectrumOptimizer:
         Returns:
             Predicted interference level (0-1 scale)
         """
-        features = self._extract_interference_features(network_topology, proposed_allocation)
+        return float(self.predict_interference_batch(network_topology, [proposed_allocation])[0])
+    
+    def predict_interference_batch(self, 
+                                   network_topology: Dict, 
+                                   proposed_allocations: List[Dict]) -> np.ndarray:
+        """
+        Predict interference levels for many proposed allocations at once
+        
+        The topology features are extracted once and all proposals are scored
+        in a single model call, so planning sweeps pay the model overhead once
+        per sweep instead of once per proposal.
         
-        if hasattr(self.interference_model, 'predict'):
-            interference_prediction = self.interference_model.predict([features])[0]
+        Args:
+            network_topology: Network cell layout and parameters
+            proposed_allocations: Proposed frequency allocations to evaluate
+        
+        Returns:
+            Predicted interference level (0-1 scale) per proposed allocation
+        """
+        if not proposed_allocations:
+            return np.zeros(0)
+        
+        features = self._interference_feature_matrix(network_topology, proposed_allocations)
+        
+        if self.interference_model is not None:
+            interference_prediction = self.interference_model.predict(features)
         else:
             # Fallback calculation for untrained model
-            interference_prediction = self._calculate_theoretical_interference(
-                network_topology, proposed_allocation
-            )
+            interference_prediction = self._theoretical_interference_batch(network_topology, features)
         
         return np.clip(interference_prediction, 0, 1)
     
+    def train_interference_model(self, 
+                                 network_topologies: List[Dict], 
+                                 allocations: List[Dict], 
+                                 observed_interference: List[float],
+                                 save: bool = True) -> Dict:
+        """
+        Train the interference model on observed allocations
+        
+        Args:
+            network_topologies: Topology of each observation
+            allocations: Frequency allocation of each observation
+            observed_interference: Measured interference level (0-1 scale) per observation
+            save: Store the trained model as the next artifact version in model_dir
+        
+        Returns:
+            Metadata of the trained model
+        """
+        if not (len(network_topologies) == len(allocations) == len(observed_interference)):
+            raise ValueError("network_topologies, allocations and observed_interference must have equal length")
+        if not allocations:
+            raise ValueError("Cannot train the interference model without observations")
+        
+        features = np.vstack([
+            self._interference_feature_matrix(topology, [allocation])
+            for topology, allocation in zip(network_topologies, allocations)
+        ])
+        target = np.asarray(observed_interference, dtype=float)
+        
+        from sklearn.ensemble import RandomForestRegressor
+        
+        model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1)
+        model.fit(features, target)
+        # Single-threaded inference: thread pool startup dominates for small batches
+        model.set_params(n_jobs=None)
+        
+        info = {
+            'version': None,
+            'trained_at': datetime.now(timezone.utc).isoformat(),
+            'n_samples': len(target),
+            'features': list(INTERFERENCE_FEATURES),
+            'training_score': float(model.score(features, target))
+        }
+        if save:
+            info['version'] = self._latest_interference_model_version() + 1
+            self._save_interference_model(model, info)
+        
+        self.interference_model = model
+        self.interference_model_info = info
+        logger.info(f"Trained interference model on {len(target)} observations (version {info['version']})")
+        
+        return info
+    
+    def load_interference_model(self, version: Optional[int] = None) -> bool:
+        """
+        Load a stored interference model artifact
+        
+        Args:
+            version: Artifact version to load; the latest one when omitted
+        
+        Returns:
+            True when a model was loaded, False when no artifact exists
+        """
+        if version is None:
+            version = self._latest_interference_model_version()
+            if version == 0:
+                logger.info(f"No trained interference model in {self.model_dir}, using theoretical model")
+                return False
+        
+        import joblib
+        
+        artifact = joblib.load(self._interference_model_path(version))
+        if artifact['info'].get('features') != INTERFERENCE_FEATURES:
+            raise ValueError(f"Interference model v{version} was trained on a different feature set")
+        
+        self.interference_model = artifact['model']
+        self.interference_model_info = artifact['info']
+        logger.info(f"Loaded interference model v{version} from {self.model_dir}")
+        
+        return True
+    
     def dynamic_frequency_assignment(self, 
                                    cells: List[Dict], 
                                    traffic_demand: Dict) -> Dict:
         """
         Dynamic frequency assignment based on traffic patterns and interference
         
+        Cells within interference range of each other form a sparse conflict
+        graph, and channels are assigned by DSATUR graph coloring so that
+        neighboring cells do not share channels (see FrequencyAssignmentEngine).
+        
         Args:
             cells: List of cell configurations
             traffic_demand: Current traffic demand per cell
@@ -145,65 +374,136 @@ class SpectrumOptimizer:
         Returns:
             Optimized frequency assignment plan
         """
-        assignment_plan = {}
+        return self.frequency_assignment.assign(cells, traffic_demand)
+    
+    def update_frequency_assignment(self, demand_changes: Dict) -> Dict:
+        """
+        Incrementally re-plan after traffic demand changed for a few cells
         
-        # Cluster cells based on geographic proximity and traffic patterns
-        cell_features = np.array([
-            [cell['lat'], cell['lon'], traffic_demand.get(cell['id'], 0)]
-            for cell in cells
-        ])
+        Args:
+            demand_changes: New traffic demand per changed cell id
+        
+        Returns:
+            Updated frequency assignment plan for all cells
+        """
+        return self.frequency_assignment.update_demand(demand_changes)
+    
+    def _band_index(self, frequency: np.ndarray) -> np.ndarray:
+        """
+        Map frequencies (MHz) to positions in self.frequency_bands
         
-        kmeans = KMeans(n_clusters=min(5, len(cells)), random_state=42)
-        cell_clusters = kmeans.fit_predict(cell_features)
+        Band ranges are inclusive on both ends and must not overlap.
         
-        for cluster_id in np.unique(cell_clusters):
-            cluster_cells = [cells[i] for i in np.where(cell_clusters == cluster_id)[0]]
+        Returns:
+            Band position per frequency, -1 where no band matches
+        """
+        ranges = np.array([info['range'] for info in self.frequency_bands.values()], dtype=float)
+        order = np.argsort(ranges[:, 0])
+        
+        # Interleaved [low, just-above-high) edges: an odd insertion point means
+        # the frequency falls inside a band, an even one that it falls between bands
+        edges = np.column_stack([ranges[order, 0], np.nextafter(ranges[order, 1], np.inf)]).ravel()
+        band_at_position = np.full(len(edges) + 1, -1)
+        band_at_position[1::2] = order
+        
+        return band_at_position[np.searchsorted(edges, frequency, side='right')]
+    
+    def _accumulate_band_statistics(self, 
+                                    frequency: np.ndarray, 
+                                    power: np.ndarray, 
+                                    group_codes: Optional[np.ndarray] = None, 
+                                    n_groups: int = 1) -> np.ndarray:
+        """
+        Single-pass per-band accumulators for a batch of measurements
+        
+        Accumulators are additive, so batches can be summed before summarizing.
+        
+        Args:
+            frequency: Measurement frequencies (MHz)
+            power: Measured power (dBm)
+            group_codes: Optional group (e.g. cell) code per measurement, 0..n_groups-1
+            n_groups: Number of groups
+        
+        Returns:
+            Array of shape (n_groups, n_bands, 5) indexed by the BAND_STAT_* columns
+        """
+        n_bands = len(self.frequency_bands)
+        band = self._band_index(frequency)
+        
+        # Shift by one so out-of-band measurements land in a discarded bin 0
+        if group_codes is None:
+            bins = band + 1
+        else:
+            bins = np.where((band >= 0) & (group_codes >= 0), group_codes * n_bands + band + 1, 0)
+        
+        has_power = ~np.isnan(power)
+        relative_power = np.where(has_power, power - NOISE_FLOOR_DBM, 0.0)
+        size = n_groups * n_bands + 1
+        
+        stats = np.column_stack([
+            np.bincount(bins, minlength=size),
+            np.bincount(bins, weights=power > NOISE_FLOOR_DBM, minlength=size),
+            np.bincount(bins, weights=has_power, minlength=size),
+            np.bincount(bins, weights=relative_power, minlength=size),
+            np.bincount(bins, weights=relative_power ** 2, minlength=size)
+        ]).astype(float)
+        
+        return stats[1:].reshape(n_groups, n_bands, 5)
+    
+    def _summarize_band_statistics(self, band_stats: np.ndarray) -> Dict:
+        """Turn per-band accumulators of shape (n_bands, 5) into the utilization report"""
+        utilization_stats = {}
+        
+        for band_name, stats in zip(self.frequency_bands, band_stats):
+            count = stats[BAND_STAT_COUNT]
+            if count == 0:
+                continue
             
-            # Assign frequencies within cluster to minimize interference
-            frequencies = self._assign_cluster_frequencies(cluster_cells, traffic_demand)
+            power_count = stats[BAND_STAT_POWER_COUNT]
+            mean_power = np.nan
+            power_std = np.nan
+            if power_count > 0:
+                mean_relative = stats[BAND_STAT_SUM] / power_count
+                mean_power = NOISE_FLOOR_DBM + mean_relative
+            if power_count > 1:
+                # Sample standard deviation (ddof=1) from the accumulated moments
+                variance = (stats[BAND_STAT_SUMSQ] - power_count * mean_relative ** 2) / (power_count - 1)
+                power_std = np.sqrt(max(variance, 0.0))
             
-            for cell, freq in zip(cluster_cells, frequencies):
-                assignment_plan[cell['id']] = {
-                    'primary_frequency': freq['primary'],
-                    'secondary_frequencies': freq['secondary'],
-                    'power_level': freq['power'],
-                    'cluster': cluster_id
-                }
+            utilization = self._calculate_band_utilization(count, stats[BAND_STAT_ACTIVE])
+            efficiency = self._calculate_spectral_efficiency(mean_power)
+            interference = self._detect_interference(power_std)
+            
+            utilization_stats[band_name] = {
+                'utilization_percentage': utilization,
+                'spectral_efficiency': efficiency,
+                'interference_level': interference,
+                'recommendation': self._generate_recommendation(utilization, interference)
+            }
         
-        return assignment_plan
+        return utilization_stats
     
-    def _calculate_band_utilization(self, band_data: pd.DataFrame) -> float:
+    def _calculate_band_utilization(self, count: float, active_count: float) -> float:
         """Calculate spectrum utilization for a frequency band"""
-        if band_data.empty:
+        if count == 0:
             return 0.0
         
         # Calculate based on power levels above noise floor
-        noise_floor = -110  # dBm
-        active_measurements = band_data[band_data['power'] > noise_floor]
-        
-        utilization = len(active_measurements) / len(band_data) * 100
+        utilization = active_count / count * 100
         return min(utilization, 100.0)
     
-    def _calculate_spectral_efficiency(self, band_data: pd.DataFrame) -> float:
+    def _calculate_spectral_efficiency(self, mean_power: float) -> float:
         """Calculate spectral efficiency in bps/Hz"""
-        if band_data.empty:
-            return 0.0
-        
         # Simplified calculation based on SINR and modulation
-        avg_sinr = band_data['power'].mean() - (-110)  # Simplified SINR
+        avg_sinr = mean_power - NOISE_FLOOR_DBM  # Simplified SINR
         
         # Shannon capacity approximation
         spectral_efficiency = np.log2(1 + 10**(avg_sinr/10))
         
         return min(spectral_efficiency, 4.5)  # Cap at realistic 5G maximum
     
-    def _detect_interference(self, band_data: pd.DataFrame) -> str:
+    def _detect_interference(self, power_std: float) -> str:
         """Detect interference patterns in frequency band"""
-        if band_data.empty:
-            return "low"
-        
-        power_std = band_data['power'].std()
-        
         if power_std > 10:
             return "high"
         elif power_std > 5:
@@ -223,67 +523,311 @@ class SpectrumOptimizer:
             return "Operating within optimal parameters"
     
     def _calculate_throughput(self, allocated_carriers: np.ndarray) -> float:
-        """Calculate throughput based on allocated carriers"""
+        """Calculate throughput based on allocated carriers (summed over the last axis)"""
         # Simplified throughput calculation
         bandwidth_per_carrier = 20  # MHz
-        total_bandwidth = np.sum(allocated_carriers) * bandwidth_per_carrier
+        total_bandwidth = np.sum(allocated_carriers, axis=-1) * bandwidth_per_carrier
         spectral_efficiency = 2.9  # bps/Hz realistic for 5G production networks
         
         return total_bandwidth * spectral_efficiency  # Mbps
     
-    def _extract_interference_features(self, 
+    def _carrier_aggregation_cost(self, 
+                                  population: np.ndarray, 
+                                  required_throughput: np.ndarray) -> np.ndarray:
+        """
+        Carrier aggregation cost for a batch of candidate allocations
+        
+        Args:
+            population: Allocations of shape (pop_size, users, carriers)
+            required_throughput: Required throughput per user (Mbps)
+        
+        Returns:
+            Cost per candidate, shape (pop_size,)
+        """
+        achieved_throughput = self._calculate_throughput(population)
+        
+        # Penalty for not meeting requirements
+        shortfall = np.maximum(required_throughput - achieved_throughput, 0.0)
+        
+        # Cost for using spectrum resources
+        spectrum_cost = population.sum(axis=(1, 2)) * CARRIER_SPECTRUM_COST
+        
+        return np.sum(shortfall ** 2, axis=1) + spectrum_cost
+    
+    def _solve_user_carrier_allocation(self, required_throughput: np.ndarray) -> np.ndarray:
+        """
+        Exact per-user minimizer of the carrier aggregation cost
+        
+        Each user's cost only depends on its total allocated share s in
+        [0, carriers]: max(0, r - k * s)^2 + c * s with k the throughput per unit
+        share. It is convex, so the optimum is the stationary point
+        s = r / k - c / (2 k^2) clipped to the bounds. The share fills the
+        primary carrier first, then the secondary ones.
+        
+        Returns:
+            Allocation of shape (users, carriers)
+        """
+        throughput_per_share = self._calculate_throughput(np.ones(1))
+        total_share = np.clip(
+            required_throughput / throughput_per_share
+            - CARRIER_SPECTRUM_COST / (2 * throughput_per_share ** 2),
+            0.0,
+            CARRIERS_PER_USER
+        )
+        carrier_index = np.arange(CARRIERS_PER_USER)
+        return np.clip(total_share[:, np.newaxis] - carrier_index, 0.0, 1.0)
+    
+    def _interference_feature_matrix(self, 
                                      topology: Dict, 
-                                     allocation: Dict) -> List[float]:
-        """Extract features for interference prediction"""
-        features = [
-            len(topology.get('cells', [])),  # Number of cells
-            allocation.get('frequency_reuse_factor', 1),  # Reuse factor
-            topology.get('average_cell_distance', 1000),  # Average inter-cell distance
-            allocation.get('power_level', 43),  # Transmission power
-            len(allocation.get('allocated_frequencies', [])),  # Number of frequencies
-        ]
+                                     allocations: List[Dict]) -> np.ndarray:
+        """Feature matrix (one row per allocation, columns as INTERFERENCE_FEATURES)"""
+        features = np.empty((len(allocations), len(INTERFERENCE_FEATURES)))
+        features[:, 0] = len(topology.get('cells', []))  # Number of cells
+        features[:, 1] = [allocation.get('frequency_reuse_factor', 1) for allocation in allocations]  # Reuse factor
+        features[:, 2] = topology.get('average_cell_distance', 1000)  # Average inter-cell distance
+        features[:, 3] = [allocation.get('power_level', 43) for allocation in allocations]  # Transmission power
+        features[:, 4] = [len(allocation.get('allocated_frequencies', [])) for allocation in allocations]  # Number of frequencies
         
         return features
     
-    def _calculate_theoretical_interference(self, 
-                                          topology: Dict, 
-                                          allocation: Dict) -> float:
+    def _theoretical_interference_batch(self, 
+                                        topology: Dict, 
+                                        features: np.ndarray) -> np.ndarray:
         """Calculate theoretical interference when model is not trained"""
-        reuse_factor = allocation.get('frequency_reuse_factor', 1)
+        reuse_factor = features[:, 1]
         cell_density = len(topology.get('cells', [])) / topology.get('coverage_area', 1000)
         
         # Simplified interference calculation
         interference = (cell_density * 0.1) / reuse_factor
         
-        return min(interference, 1.0)
+        return np.minimum(interference, 1.0)
+    
+    def _interference_model_path(self, version: int) -> str:
+        return os.path.join(self.model_dir, f"{INTERFERENCE_MODEL_PREFIX}-v{version:04d}.joblib")
+    
+    def _latest_interference_model_version(self) -> int:
+        """Highest stored artifact version, 0 when none exists"""
+        if not os.path.isdir(self.model_dir):
+            return 0
+        versions = [
+            int(match.group(1))
+            for match in map(INTERFERENCE_MODEL_PATTERN.match, os.listdir(self.model_dir))
+            if match
+        ]
+        return max(versions, default=0)
+    
+    def _save_interference_model(self, model: 'RandomForestRegressor', info: Dict) -> None:
+        """Write the artifact atomically so a concurrent load never sees a partial file"""
+        import joblib
+        
+        os.makedirs(self.model_dir, exist_ok=True)
+        path = self._interference_model_path(info['version'])
+        tmp_path = f"{path}.tmp"
+        joblib.dump({'model': model, 'info': info}, tmp_path)
+        os.replace(tmp_path, path)
+
+
+class FrequencyAssignmentEngine:
+    """
+    Channel assignment by DSATUR coloring of a sparse cell conflict graph
+    
+    Two cells conflict when they are within conflict_radius_km. Each cell needs
+    one primary channel plus one secondary channel per demand_per_secondary
+    units of demand (up to max_secondary), and no two conflicting cells should
+    share a channel. Cells are colored in order of saturation (channels already
+    blocked by colored neighbors), then demand and degree, with per-cell
+    channel masks kept as integer bitsets. When a cell has fewer free channels
+    than it needs, the channels least used by its neighbors are reused.
+    """
     
-    def _assign_cluster_frequencies(self, 
-                                   cluster_cells: List[Dict], 
-                                   traffic_demand: Dict) -> List[Dict]:
-        """Assign frequencies within a cell cluster"""
-        frequencies = []
-        available_freqs = list(range(1, 21))  # 20 available frequency channels
+    def __init__(self, 
+                 n_channels: int = 20, 
+                 conflict_radius_km: float = 2.0,
+                 demand_per_secondary: float = 10, 
+                 max_secondary: int = 3):
+        self.n_channels = n_channels
+        self.conflict_radius_km = conflict_radius_km
+        self.demand_per_secondary = demand_per_secondary
+        self.max_secondary = max_secondary
+        
+        self.cell_ids: List = []
+        self.cell_index: Dict = {}
+        self.indptr = np.zeros(1, dtype=np.intp)
+        self.indices = np.zeros(0, dtype=np.intp)
+        # The same adjacency as Python lists, which the coloring loop indexes per cell
+        self._indptr: List[int] = [0]
+        self._indices: List[int] = []
+        self.demand = np.zeros(0)
+        self.channels: List[List[int]] = []
+        self.components = np.zeros(0, dtype=int)
+        self._plan: Dict = {}
+    
+    def assign(self, cells: List[Dict], traffic_demand: Dict) -> Dict:
+        """
+        Build the conflict graph for cells and color it from scratch
         
-        for i, cell in enumerate(cluster_cells):
-            demand = traffic_demand.get(cell['id'], 1)
-            
-            # Assign primary frequency based on position in cluster
-            primary_freq = available_freqs[i % len(available_freqs)]
-            
-            # Assign secondary frequencies based on demand
-            secondary_count = min(int(demand / 10), 3)  # Max 3 secondary frequencies
-            secondary_freqs = [
-                available_freqs[(i + j + 1) % len(available_freqs)] 
-                for j in range(secondary_count)
-            ]
+        Args:
+            cells: Cell configurations with 'id', 'lat' and 'lon'
+            traffic_demand: Current traffic demand per cell id
+        
+        Returns:
+            Frequency assignment plan keyed by cell id
+        """
+        self.cell_ids = [cell['id'] for cell in cells]
+        self.cell_index = {cell_id: i for i, cell_id in enumerate(self.cell_ids)}
+        from scipy.sparse.csgraph import connected_components
+        
+        self.demand = np.array([traffic_demand.get(cell_id, 1) for cell_id in self.cell_ids], dtype=float)
+        
+        adjacency = self._build_conflict_graph(cells)
+        self.indptr, self.indices = adjacency.indptr, adjacency.indices
+        self._indptr, self._indices = self.indptr.tolist(), self.indices.tolist()
+        _, self.components = connected_components(adjacency, directed=False)
+        
+        self.channels = [[] for _ in self.cell_ids]
+        self._color(range(len(self.cell_ids)))
+        
+        return self.plan()
+    
+    def update_demand(self, demand_changes: Dict) -> Dict:
+        """
+        Recolor only the cells whose channel requirement changed
+        
+        The rest of the plan stays fixed, so the cost is proportional to the
+        changed cells and their neighborhoods rather than to the network size.
+        The returned plan is the engine's current plan, updated in place.
+        
+        Raises:
+            ValueError: If assign() has not run or a cell id is unknown
+        """
+        if not self.channels:
+            raise ValueError("assign() must be called before update_demand()")
+        unknown = [cell_id for cell_id in demand_changes if cell_id not in self.cell_index]
+        if unknown:
+            raise ValueError(f"Unknown cell ids in demand_changes: {unknown[:10]}")
+        
+        updated, changed = [], []
+        for cell_id, demand in demand_changes.items():
+            i = self.cell_index[cell_id]
+            needs_recolor = self._channels_needed(demand) != self._channels_needed(self.demand[i])
+            self.demand[i] = demand
+            updated.append(i)
+            if needs_recolor:
+                changed.append(i)
+        
+        for i in changed:
+            self.channels[i] = []
+        self._color(changed)
+        
+        # Only the updated cells' entries change; the rest of the plan is reused
+        for i in updated:
+            self._plan[self.cell_ids[i]] = self._plan_entry(i, min(43, 20 + self.demand[i] * 0.5))
+        return self._plan
+    
+    def plan(self) -> Dict:
+        """Current assignment in the dynamic_frequency_assignment plan format (channels 1..n)"""
+        power = np.minimum(43, 20 + self.demand * 0.5)  # Max 43 dBm
+        self._plan = {cell_id: self._plan_entry(i, power[i]) for i, cell_id in enumerate(self.cell_ids)}
+        return self._plan
+    
+    def _plan_entry(self, i: int, power: float) -> Dict:
+        return {
+            'primary_frequency': self.channels[i][0] + 1,
+            'secondary_frequencies': [channel + 1 for channel in self.channels[i][1:]],
+            'power_level': float(power),
+            'cluster': int(self.components[i])
+        }
+    
+    def count_conflicts(self) -> int:
+        """Number of neighboring cell pairs that share at least one channel"""
+        masks = [self._mask(channels) for channels in self.channels]
+        conflicts = 0
+        for i in range(len(masks)):
+            for j in self.indices[self.indptr[i]:self.indptr[i + 1]]:
+                if j > i and masks[i] & masks[j]:
+                    conflicts += 1
+        return conflicts
+    
+    def _channels_needed(self, demand: float) -> int:
+        """Primary channel plus demand-driven secondary channels"""
+        return 1 + min(int(demand / self.demand_per_secondary), self.max_secondary)
+    
+    def _build_conflict_graph(self, cells: List[Dict]) -> 'csr_matrix':
+        """Sparse symmetric adjacency of cells within conflict_radius_km"""
+        from scipy.sparse import csr_matrix
+        from scipy.spatial import cKDTree
+        
+        lat = np.radians([cell['lat'] for cell in cells])
+        lon = np.radians([cell['lon'] for cell in cells])
+        points = EARTH_RADIUS_KM * np.column_stack([
+            np.cos(lat) * np.cos(lon),
+            np.cos(lat) * np.sin(lon),
+            np.sin(lat)
+        ])
+        chord_radius = 2 * EARTH_RADIUS_KM * np.sin(self.conflict_radius_km / (2 * EARTH_RADIUS_KM))
+        pairs = cKDTree(points).query_pairs(chord_radius, output_type='ndarray').reshape(-1, 2)
+        
+        n_cells = len(cells)
+        rows = np.concatenate([pairs[:, 0], pairs[:, 1]])
+        cols = np.concatenate([pairs[:, 1], pairs[:, 0]])
+        return csr_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(n_cells, n_cells))
+    
+    @staticmethod
+    def _mask(channels: List[int]) -> int:
+        mask = 0
+        for channel in channels:
+            mask |= 1 << channel
+        return mask
+    
+    def _color(self, cells) -> None:
+        """DSATUR coloring of the given uncolored cells, with all other cells fixed"""
+        indptr, indices = self._indptr, self._indices
+        pending = set(cells)
+        needed = {i: self._channels_needed(self.demand[i]) for i in pending}
+        
+        # Channels blocked by already colored neighbors, as bitsets
+        blocked = {}
+        for i in pending:
+            mask = 0
+            for j in indices[indptr[i]:indptr[i + 1]]:
+                if j not in pending:
+                    mask |= self._mask(self.channels[j])
+            blocked[i] = mask
+        
+        heap = [
+            (-blocked[i].bit_count(), -needed[i], -(indptr[i + 1] - indptr[i]), i)
+            for i in pending
+        ]
+        heapq.heapify(heap)
+        
+        while heap:
+            saturation, _, _, i = heapq.heappop(heap)
+            if i not in pending or -saturation != blocked[i].bit_count():
+                continue  # Stale heap entry
+            pending.discard(i)
             
-            # Power level based on demand and interference considerations
-            power_level = min(43, 20 + demand * 0.5)  # Max 43 dBm
+            channels = self._pick_channels(i, blocked.pop(i), needed[i], indptr, indices)
+            self.channels[i] = channels
+            channel_mask = self._mask(channels)
             
-            frequencies.append({
-                'primary': primary_freq,
-                'secondary': secondary_freqs,
-                'power': power_level
-            })
-        
-        return frequencies
\ No newline at end of file
+            for j in indices[indptr[i]:indptr[i + 1]]:
+                if j in pending:
+                    previous = blocked[j]
+                    blocked[j] = previous | channel_mask
+                    if blocked[j] != previous:
+                        heapq.heappush(heap, (
+                            -blocked[j].bit_count(), -needed[j], -(indptr[j + 1] - indptr[j]), j
+                        ))
+    
+    def _pick_channels(self, i: int, blocked: int, needed: int, indptr: List[int], indices: List[int]) -> List[int]:
+        """Lowest free channels, falling back to the channels least used by neighbors"""
+        channels = [c for c in range(self.n_channels) if not blocked >> c & 1][:needed]
+        if len(channels) == needed:
+            return channels
+        
+        usage = [0] * self.n_channels
+        for j in indices[indptr[i]:indptr[i + 1]]:
+            for channel in self.channels[j]:
+                usage[channel] += 1
+        reused = sorted((c for c in range(self.n_channels) if blocked >> c & 1), key=lambda c: usage[c])
+        return channels + reused[:needed - len(channels)]
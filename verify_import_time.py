@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Import-time budget check for the API cold start.
+
+Imports each module in a fresh interpreter with `python -X importtime`, reports
+its cumulative import time and fails when a module exceeds the budget or pulls
+in a heavy ML/scientific dependency at import time. Those dependencies must be
+imported inside the functions that use them.
+
+Usage: python verify_import_time.py [--budget-ms 1500] [--repeat 3]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# (module, directory it is imported from)
+MODULES = [
+    ('main', 'api'),
+    ('services.rf_optimizer', 'api'),
+    ('services.optimizer_engine', 'api'),
+    ('services.site_neighbor_index', 'api'),
+    ('services.slice_orchestrator', 'api'),
+    ('services.advanced_analytics', 'api'),
+    ('services.capacity_planner', 'api'),
+    ('spectrum_optimizer', 'ml'),
+    ('ai_performance_tuner', 'ml'),
+]
+
+# Packages that may only be imported on first use
+HEAVY_PACKAGES = ('tensorflow', 'sklearn', 'scipy', 'pandas', 'joblib')
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$')
+
+def measure(module, directory):
+    """Cumulative import time of module in microseconds and the heavy packages it loaded"""
+    probe = (
+        f"import sys; import {module}; "
+        f"print(','.join(sorted({{name.split('.')[0] for name in sys.modules}} & {set(HEAVY_PACKAGES)!r})))"
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', probe],
+        cwd=os.path.join(ROOT, directory), capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+
+    cumulative = None
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        # The top-level module is the unindented entry with its exact name
+        if match and match.group(4) == module and len(match.group(3)) == 1:
+            cumulative = int(match.group(2))
+    heavy = [name for name in result.stdout.strip().split(',') if name]
+    return cumulative, heavy
+
+def main():
+    """Main verification function"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--budget-ms', type=float, default=1500,
+                        help='maximum cumulative import time per module')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='imports per module; the fastest is reported')
+    parser.add_argument('modules', nargs='*', help='only check these modules')
+    args = parser.parse_args()
+
+    modules = [(module, directory) for module, directory in MODULES
+               if not args.modules or module in args.modules]
+
+    print(f"{'module':<34}{'import ms':>10}  heavy packages")
+    issues = []
+    for module, directory in modules:
+        try:
+            runs = [measure(module, directory) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            issues.append(str(e))
+            continue
+        cumulative = min(run[0] for run in runs) / 1000
+        heavy = runs[0][1]
+        print(f"{module:<34}{cumulative:>10.1f}  {', '.join(heavy) or '-'}")
+
+        if cumulative > args.budget_ms:
+            issues.append(f"{module} took {cumulative:.0f} ms to import (budget {args.budget_ms:.0f} ms)")
+        if heavy:
+            issues.append(f"{module} imports {', '.join(heavy)} at import time")
+
+    if issues:
+        print(f"\n❌ Found {len(issues)} issues:")
+        for issue in issues:
+            print(f"  - {issue}")
+        sys.exit(1)
+    print("\n✅ All modules are within the import-time budget")
+
+if __name__ == "__main__":
+    main()
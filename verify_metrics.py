@@ -31,7 +31,7 @@ def check_file(filepath):
             issues.append(f"Found old spectrum efficiency (3.4) in {filepath}")
             
         # Verify new values are present in key files
-        if 'README' in filepath or 'api/main.py' in filepath:
+        if 'README' in filepath or 'api/services/metrics_simulator.py' in filepath:
             if '91' not in content:
                 issues.append(f"Missing new SLA value (91%) in {filepath}")
             if '2.9' not in content and 'spectrum' in content.lower():
@@ -50,7 +50,7 @@ def verify_all_files():
     # Key files to check
     key_files = [
         'README.md',
-        'api/main.py',
+        'api/services/metrics_simulator.py',
         'api/services/sla_monitor.py',
         'ml/spectrum_optimizer.py',
         'docs/TECHNICAL_BRIEF_NETWORK_SLICING.md'